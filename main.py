@@ -8,6 +8,11 @@ import time
 
 from modules.battlenetloop import enter_from_battlenet
 from modules.gameloop import where
+from modules.image_utils import (
+    load_template_registry,
+    open_template_atlas,
+    start_capture_service,
+)
 from modules.platforms import win
 from modules.reconnects import game_closed
 from modules.resolution import gen_images_new_resolution
@@ -23,6 +28,9 @@ formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(messag
 h.setFormatter(formatter)
 mod_logger.addHandler(h)
 
+# seconds without progress in the game (see gameloop.where) before killing it
+IDLE_TIMEOUT = 300
+
 
 def main():
     """
@@ -30,9 +38,12 @@ def main():
     """
     log.info("Python version: %s", sys.version)
     gen_images_new_resolution()
+    load_template_registry()
+    open_template_atlas()
+    start_capture_service()
     # Sometimes it is the first BN window shall be launched, sometimes it is the second.
     BNCount = 1
-    idle_count = 0
+    last_progress = time.monotonic()
     while True:
         log.debug("Loop")
         try:
@@ -40,12 +51,11 @@ def main():
                 BNCount = 1
                 success = where()
                 if success:
-                    idle_count = 0
-                else:
-                    idle_count += 1
-                    if idle_count > 20:
-                        log.info("Idle for 10 loops, kill Hearthstone")
-                        game_closed()
+                    last_progress = time.monotonic()
+                elif time.monotonic() - last_progress > IDLE_TIMEOUT:
+                    log.info("Idle for %s seconds, kill Hearthstone", IDLE_TIMEOUT)
+                    game_closed()
+                    last_progress = time.monotonic()
             elif win.find_game("Battle.net", BNCount):
                 enter_from_battlenet()
                 if BNCount == 0:
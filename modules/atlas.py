@@ -0,0 +1,219 @@
+"""
+This module provides the template atlas: every template image (of every resolution
+and every locale of the images directory) packed into a single binary file.
+
+The atlas is built once (and again when an image is added or modified) and opened
+with a memory map, so the templates don't have to be read and decoded from PNG files
+during the first battles, and the pages are shared between several bots.
+
+File format:
+    MAGIC (8 bytes), length of the index (8 bytes, little endian), index (JSON),
+    then the planes (uint8), starting at DATA_ALIGN bytes:
+
+    {"files/1920x1080/buttons/play.png": {
+        "shape": [height, width], "gray": offset, "alpha": offset or null,
+        "mtime": mtime_ns, "size": file size}}
+
+Functions:
+- list_templates: List the template files of the images directory.
+- build_atlas: Pack the template files into an atlas.
+- atlas_is_stale: Check if an atlas has to be built again.
+
+Classes:
+- TemplateAtlas: A memory mapped template atlas.
+"""
+
+import json
+import logging
+import os
+import re
+
+import cv2
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"MFBATL01"
+DATA_ALIGN = 4096
+
+
+def list_templates(root_dir):
+    """
+    Lists the template files of the images directory: the PNG files of the
+    resolution directories (like "1920x1080") and of the "i18n" directory.
+
+    Args:
+        root_dir (str): The images directory (like "files").
+
+    Returns:
+        list: The paths of the templates (like "files/1920x1080/buttons/play.png").
+    """
+    templates = []
+    for name in sorted(os.listdir(root_dir)):
+        if not (re.match(r"^\d+x\d+$", name) or name == "i18n"):
+            continue
+        for dirpath, dirnames, filenames in os.walk(f"{root_dir}/{name}"):
+            dirnames.sort()
+            dirpath = dirpath.replace(os.sep, "/")
+            templates.extend(
+                f"{dirpath}/{filename}"
+                for filename in sorted(filenames)
+                if filename.endswith(".png")
+            )
+    return templates
+
+
+def file_signature(path):
+    """Returns [mtime_ns, size] of a file."""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def build_atlas(root_dir, filename):
+    """
+    Packs every template of the images directory (grayscale plane and alpha plane
+    if there is one) into an atlas file.
+
+    Args:
+        root_dir (str): The images directory (like "files").
+        filename (str): The atlas file.
+
+    Returns:
+        int: The number of templates in the atlas.
+    """
+    index = {}
+    planes = []
+    offset = 0
+    for path in list_templates(root_dir):
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            log.warning("Atlas: can't read %s", path)
+            continue
+        entry = {"shape": list(gray.shape[:2]), "gray": offset, "alpha": None}
+        planes.append(gray)
+        offset += gray.size
+
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image.ndim == 3 and image.shape[2] == 4:
+            entry["alpha"] = offset
+            planes.append(image[:, :, 3])
+            offset += gray.size
+
+        entry["mtime"], entry["size"] = file_signature(path)
+        index[path] = entry
+
+    header = json.dumps(index).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // DATA_ALIGN) * DATA_ALIGN
+
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    tmpfile = f"{filename}.tmp"
+    with open(tmpfile, "wb") as descriptor:
+        descriptor.write(MAGIC)
+        descriptor.write(len(header).to_bytes(8, "little"))
+        descriptor.write(header)
+        descriptor.write(b"\0" * (data_start - descriptor.tell()))
+        for plane in planes:
+            descriptor.write(np.ascontiguousarray(plane).tobytes())
+    os.replace(tmpfile, filename)
+    log.info("Template atlas: %s images packed into %s", len(index), filename)
+    return len(index)
+
+
+def read_index(filename):
+    """
+    Reads the index of an atlas.
+
+    Args:
+        filename (str): The atlas file.
+
+    Returns:
+        tuple: (index, data_start) the index and the offset of the planes in the file.
+
+    Raises:
+        ValueError: If the file isn't an atlas.
+    """
+    with open(filename, "rb") as descriptor:
+        if descriptor.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} isn't a template atlas")
+        length = int.from_bytes(descriptor.read(8), "little")
+        index = json.loads(descriptor.read(length).decode("utf-8"))
+    data_start = -(-(len(MAGIC) + 8 + length) // DATA_ALIGN) * DATA_ALIGN
+    return index, data_start
+
+
+def atlas_is_stale(root_dir, filename):
+    """
+    Checks if an atlas has to be built again: it doesn't exist, or a template
+    was added, removed or modified since it was built.
+
+    Args:
+        root_dir (str): The images directory (like "files").
+        filename (str): The atlas file.
+
+    Returns:
+        bool: True if the atlas has to be built.
+    """
+    if not os.path.isfile(filename):
+        return True
+    try:
+        index, _ = read_index(filename)
+    except (OSError, ValueError) as error:
+        log.warning("Template atlas %s unreadable: %s", filename, error)
+        return True
+
+    templates = list_templates(root_dir)
+    if set(templates) != set(index):
+        return True
+    return any(
+        file_signature(path) != [index[path]["mtime"], index[path]["size"]]
+        for path in templates
+    )
+
+
+class TemplateAtlas:
+    """
+    A memory mapped template atlas. The images are read-only views on the file.
+    """
+
+    def __init__(self, filename):
+        """
+        Opens an atlas.
+
+        Args:
+            filename (str): The atlas file.
+        """
+        self.filename = filename
+        self.index, data_start = read_index(filename)
+        if self.index:
+            self._data = np.memmap(filename, np.uint8, mode="r", offset=data_start)
+        else:
+            self._data = np.empty(0, np.uint8)
+        log.debug("Template atlas %s opened (%s images)", filename, len(self.index))
+
+    def __contains__(self, path):
+        return path in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, path):
+        """
+        Gets the planes of a template.
+
+        Args:
+            path (str): The path of the template (like "files/1920x1080/buttons/play.png").
+
+        Returns:
+            tuple: The grayscale image and the alpha channel (or None).
+        """
+        entry = self.index[path]
+        height, width = entry["shape"]
+        gray = self._plane(entry["gray"], height, width)
+        alpha = None
+        if entry["alpha"] is not None:
+            alpha = self._plane(entry["alpha"], height, width)
+        return gray, alpha
+
+    def _plane(self, offset, height, width):
+        plane = self._data[offset : offset + height * width].reshape(height, width)
+        return np.asarray(plane)
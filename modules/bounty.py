@@ -12,7 +12,12 @@ from modules.campfire import look_at_campfire_completed_tasks
 from modules.constants import Action, Button, UIElement
 from modules.encounter import selectCardsInHand
 from modules.game import defaultCase, wait_until_timeout
-from modules.image_utils import find_element
+from modules.image_utils import (
+    find_all_elements,
+    find_element,
+    find_elements,
+    invalidate_frame,
+)
 from modules.mouse_utils import (
     MOUSE_RANGE,
     mouse_click,
@@ -22,41 +27,63 @@ from modules.mouse_utils import (
 )
 from modules.notification import send_notification, send_slack_notification
 from modules.platforms import windowMP
+from modules.screen_catalog import screen_catalog
+from modules.screens import MAP_SCREENS
+from modules.state_machine import (
+    ANY,
+    TIMEOUT,
+    UNKNOWN,
+    State,
+    StateMachine,
+    Transition,
+    screen_events,
+)
 from modules.settings import jthreshold, settings_dict
 from modules.treasure import chooseTreasure
 from modules.utils import rsleep
 
 log = logging.getLogger(__name__)
 
+# steps on the map (without fight) before leaving the bounty
+MAX_MAP_STEPS = 30
+# seconds on the map without any step or fight before leaving the bounty
+MAP_TIMEOUT = 300
+
 
 def collect():
     """
     Collect the rewards just after beating the final boss of this level
     """
 
-    # it's difficult to find every boxes with lib CV2 so,
-    # we try to detect just one and then we click on all known positions
+    # look for every box at once (one search) and click on them,
+    # if none is found we click on all known positions
     collectAttempts = 0
 
     while True:
         collectAttempts += 1
 
-        positions = [
-            (2.5, 3.5),
-            (2, 3.5),
-            (1.5, 3.5),
-            (1.5, 2.4),
-            (2.7, 1.4),
-            (3, 2.7),
-            (1.4, 1.3),
-            (1.6, 1.3),
-            (1.7, 1.3),
-            (1.8, 1.3),
-            (1.9, 1.3),
-        ]
-
-        for x, y in positions:
-            move_mouse_and_click(windowMP(), windowMP()[2] / x, windowMP()[3] / y)
+        boxes = find_all_elements(UIElement.reward_chest.filename)
+        if len(boxes):
+            log.info("Found %s reward box(es)", len(boxes))
+            for x, y, _ in boxes:
+                move_mouse_and_click(windowMP(), x, y)
+        else:
+            positions = [
+                (2.5, 3.5),
+                (2, 3.5),
+                (1.5, 3.5),
+                (1.5, 2.4),
+                (2.7, 1.4),
+                (3, 2.7),
+                (1.4, 1.3),
+                (1.6, 1.3),
+                (1.7, 1.3),
+                (1.8, 1.3),
+                (1.9, 1.3),
+            ]
+
+            for x, y in positions:
+                move_mouse_and_click(windowMP(), windowMP()[2] / x, windowMP()[3] / y)
 
         # click done button in middle
         move_mouse_and_click(windowMP(), windowMP()[2] / 1.9, windowMP()[3] / 1.8)
@@ -106,92 +133,109 @@ def quitBounty():
     return end
 
 
-def nextlvl():
-    """
-    Progress on the map (Boon, Portal, ...) to find the next battle
-    """
-    rsleep(3)
-    retour = True
+def click_map_step(state):
+    """Click on the element found on the map"""
+    x, y = state.result.random_coords()
+    move_mouse_and_click(windowMP(), x, y)
+    invalidate_frame()
 
-    if not find_element(Button.play.filename, Action.screenshot):
-        if (
-            find_element(UIElement.task_completed.filename, Action.screenshot)
-            or find_element(UIElement.task_event_completed.filename, Action.screenshot)
-            or find_element(
-                UIElement.task_expansion_completed.filename, Action.screenshot
-            )
-        ):
-            wait_until_timeout(UIElement.campfire, 10)
-            look_at_campfire_completed_tasks()
 
-        elif find_element(Button.reveal.filename, Action.move_and_click):
-            rsleep(1)
-            move_mouse_and_click(windowMP(), windowMP()[2] / 2, windowMP()[3] // 1.25)
-            rsleep(1.5)
+def claim_task(state):
+    """A task is completed: claim it at the campfire"""
+    wait_until_timeout(UIElement.campfire, 10)
+    look_at_campfire_completed_tasks()
 
-        elif find_element(Button.visit.filename, Action.move_and_click):
-            rsleep(7)
 
-        elif find_element(Button.pick.filename, Action.move_and_click) or find_element(
-            Button.portal_warp.filename, Action.move_and_click
-        ):
-            rsleep(1)
-            mouse_click()
-            rsleep(5)
-        elif find_element(UIElement.mystery.filename, Action.screenshot):
-            rsleep(1)
-            find_element(UIElement.mystery.filename, Action.move_and_click)
+def reveal_encounter(state):
+    """Reveal the mysterious encounter"""
+    click_map_step(state)
+    rsleep(1)
+    move_mouse_and_click(windowMP(), *screen_catalog.target("reveal", "continue"))
+    rsleep(1.5)
 
-        elif find_element(UIElement.spirithealer.filename, Action.screenshot):
-            rsleep(1)
-            find_element(UIElement.spirithealer.filename, Action.move_and_click)
 
-        elif find_element(UIElement.campfire.filename, Action.screenshot):
-            look_at_campfire_completed_tasks()
-            rsleep(3)
-
-        # we add this test because, maybe we are not on "Encounter Map" anymore
-        # (like after the final boss)
-        elif find_element(UIElement.view_party.filename, Action.screenshot):
-            search_battle_list = []
-            battletypes = ["protector", "fighter", "caster"]
-            # random.shuffle(battletypes)
-            boontypes = ["boonfighter", "boonprotector", "booncaster"]
-            # random.shuffle(boontypes)
-            encountertypes = battletypes + boontypes
-            battletypes.append("elite")
-            encountertypes.append("elite")
-            for encounter in encountertypes:
-                tag = f"encounter_{encounter}"
-                coords = find_element(
-                    getattr(UIElement, tag).filename, Action.get_coords
-                )
-                if coords:
-                    battlepreference = f"prefer{encounter}"
-                    x = coords[0]
-                    y = (
-                        coords[1] + (windowMP()[3] // 10.8)
-                        if encounter in battletypes
-                        else coords[1]
-                    )
-
-                    if settings_dict[battlepreference]:
-                        search_battle_list.insert(0, (x, y))
-                    else:
-                        search_battle_list.append((x, y))
-            if search_battle_list:
-                log.info(f"{search_battle_list=}")
-                x, y = search_battle_list.pop(0)
-                mouse_click("right")
-                move_mouse_and_click(windowMP(), x, y)
-                rsleep(2)
+def visit(state):
+    """Visit the encounter (Boon, ...)"""
+    click_map_step(state)
+    rsleep(7)
+
+
+def pick(state):
+    """Pick a boon (or warp through the portal)"""
+    click_map_step(state)
+    rsleep(1)
+    mouse_click()
+    rsleep(5)
+
+
+def open_encounter(state):
+    """Click on the mystery or the spirit healer"""
+    rsleep(1)
+    find_element(state.result.file, Action.move_and_click)
+
+
+def visit_campfire(state):
+    """Look at the completed tasks at the campfire"""
+    look_at_campfire_completed_tasks()
+    rsleep(3)
+
+
+def choose_encounter(state):
+    """
+    Choose the next encounter on the map, according to the preferences
+    (we may not be on the "Encounter Map" anymore, like after the final boss)
+    """
+    search_battle_list = []
+    battletypes = ["protector", "fighter", "caster"]
+    # random.shuffle(battletypes)
+    boontypes = ["boonfighter", "boonprotector", "booncaster"]
+    # random.shuffle(boontypes)
+    encountertypes = battletypes + boontypes
+    battletypes.append("elite")
+    encountertypes.append("elite")
+    results = find_elements(
+        [
+            getattr(UIElement, f"encounter_{encounter}").filename
+            for encounter in encountertypes
+        ]
+    )
+    for encounter, result in zip(encountertypes, results):
+        if result.found:
+            coords = result.random_coords()
+            battlepreference = f"prefer{encounter}"
+            x = coords[0]
+            y = (
+                coords[1] + (windowMP()[3] // 10.8)
+                if encounter in battletypes
+                else coords[1]
+            )
+
+            if settings_dict[battlepreference]:
+                search_battle_list.insert(0, (x, y))
             else:
-                searchForEncounter()
+                search_battle_list.append((x, y))
+    if search_battle_list:
+        log.info(f"{search_battle_list=}")
+        x, y = search_battle_list.pop(0)
+        mouse_click("right")
+        move_mouse_and_click(windowMP(), x, y)
+        rsleep(2)
+    else:
+        searchForEncounter()
 
-        else:
-            defaultCase()
 
-    return retour
+# what to do on each step of the map (see screens.MAP_SCREENS)
+MAP_HANDLERS = {
+    "play": lambda state: None,
+    "task_completed": claim_task,
+    "reveal": reveal_encounter,
+    "visit": visit,
+    "pick": pick,
+    "mystery": open_encounter,
+    "spirithealer": open_encounter,
+    "campfire": visit_campfire,
+    "view_party": choose_encounter,
+}
 
 
 def searchForEncounter():
@@ -306,44 +350,77 @@ def goToEncounter():
     """
     log.info("goToEncounter : entering")
     rsleep(2)
-    travelEnd = False
-
     fight_count = 0
-
     step_count = 0
-    while not travelEnd:
-        # TODO: infinite loop if the game is stuck
-        if find_element(Button.play.filename, Action.screenshot):
-            if settings_dict["max_fights"] != 0 and fight_count >= settings_dict["max_fights"]:
-                rsleep(1)
-                quitBounty()
-                break                
-            travelEnd = check_boss_battle()
-            if travelEnd:
-                break
 
-            while find_element(Button.play.filename, Action.move_and_click):
-                rsleep(1)
+    def fights_done(event):
+        return (
+            settings_dict["max_fights"] != 0
+            and fight_count >= settings_dict["max_fights"]
+        )
+
+    def quit_bounty(event):
+        rsleep(1)
+        quitBounty()
+
+    def fight(event):
+        nonlocal fight_count
+        if check_boss_battle():
+            return "travel_end"
 
-            retour = selectCardsInHand()
-            log.info("goToEncounter - retour = %s", retour)
+        while find_element(Button.play.filename, Action.move_and_click):
             rsleep(1)
 
-            if retour == "win":
-                travelEnd = handle_win()
-            elif retour == "lose":
-                travelEnd = handle_lose()
-            else:
-                travelEnd = handle_unknown()
+        retour = selectCardsInHand()
+        log.info("goToEncounter - retour = %s", retour)
+        rsleep(1)
 
-            fight_count += 1
+        if retour == "win":
+            travelEnd = handle_win()
+        elif retour == "lose":
+            travelEnd = handle_lose()
         else:
-            if not nextlvl():
-                break
-            else:
-                step_count += 1
-                if step_count > 30:
-                    break
+            travelEnd = handle_unknown()
+
+        fight_count += 1
+        return "travel_end" if travelEnd else "fight_end"
+
+    def can_step(event):
+        return step_count < MAX_MAP_STEPS
+
+    def map_step(event):
+        nonlocal step_count
+        step_count += 1
+        MAP_HANDLERS[event.name](event.data)
+
+    def unknown_step(event):
+        # not a step (see MAP_TIMEOUT): maybe a popup over the map
+        defaultCase()
+
+    def stuck(event):
+        log.warning("goToEncounter : nothing happened on the map, leaving")
+
+    machine = StateMachine(
+        "encounter",
+        [
+            # wait for the animations of the map before looking at it
+            State("map", timeout=MAP_TIMEOUT, settle=3),
+            State("fight", on_enter=fight),
+            State("leave", final=True),
+        ],
+        [
+            Transition("map", "play", "leave", fights_done, quit_bounty),
+            Transition("map", "play", "fight"),
+            Transition("map", TIMEOUT, "leave", action=stuck),
+            Transition("map", UNKNOWN, "map", action=unknown_step),
+            Transition("map", ANY, "map", can_step, map_step),
+            Transition("map", ANY, "leave"),
+            Transition("fight", "travel_end", "leave"),
+            Transition("fight", "fight_end", "map"),
+        ],
+        "map",
+    )
+    machine.run([screen_events(MAP_SCREENS)])
 
     for x in range(60):
         if not find_element(UIElement.bounties.filename, Action.screenshot):
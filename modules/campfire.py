@@ -18,6 +18,7 @@ from modules.game import wait_until_timeout
 from modules.image_utils import find_element
 from modules.mouse_utils import mouse_click, move_mouse, move_mouse_and_click
 from modules.platforms import windowMP
+from modules.screen_catalog import screen_catalog
 from modules.utils import rsleep
 
 log = logging.getLogger(__name__)
@@ -96,7 +97,7 @@ def claim_task_reward():
     # Need to make a loop to try several time to click
     while find_element(Button.campfire_claim.filename, Action.move_and_click):
         rsleep(0.5)
-        move_mouse(windowMP(), windowMP()[2] / 2, windowMP()[3] / 1.125)
+        move_mouse(windowMP(), *screen_catalog.target("campfire", "claimed"))
 
     rsleep(2)
     while not find_element(UIElement.campfire.filename, Action.screenshot):
@@ -130,6 +131,6 @@ def look_at_campfire_completed_tasks():
             toggle_campfire_screen()
             toggled = True
 
-        move_mouse_and_click(windowMP(), windowMP()[2] / 1.16, windowMP()[3] / 1.93)
+        move_mouse_and_click(windowMP(), *screen_catalog.target("campfire", "close"))
 
     return retour
@@ -0,0 +1,235 @@
+"""
+This module provides a background screen capture service.
+
+The service grabs the game window on its own thread at a fixed rate, converts every
+screenshot to grayscale and writes it into a preallocated ring buffer. Probes take the
+newest frame from the buffer instead of waiting for a screenshot.
+
+Classes:
+- FrameRingBuffer: A preallocated ring buffer of grayscale frames.
+- CaptureService: A thread filling a FrameRingBuffer with screenshots of the game window.
+"""
+
+import logging
+import threading
+import time
+
+import cv2
+import mss
+import numpy as np
+
+from modules.mouse_utils import input_count
+
+log = logging.getLogger(__name__)
+
+MIN_CAPACITY = 3
+
+
+class FrameRingBuffer:
+    """
+    A preallocated ring buffer of grayscale frames shared between one writer
+    (the capture thread) and one reader (the bot).
+
+    The writer never writes into the newest slot, and 'latest' gives the reader a copy
+    of it: the frames kept by the reader (like the frame of a capture session) aren't
+    overwritten by the next screenshots.
+    """
+
+    def __init__(self, capacity, height, width):
+        """
+        Allocates the buffer.
+
+        Args:
+            capacity (int): The number of frames kept in memory (at least 3).
+            height (int): The height of the frames.
+            width (int): The width of the frames.
+        """
+        self.capacity = max(capacity, MIN_CAPACITY)
+        self.shape = (height, width)
+        self._frames = np.zeros((self.capacity, height, width), np.uint8)
+        self._timestamps = [0.0] * self.capacity
+        self._generations = [-1] * self.capacity
+        self._newest = -1
+        self._cond = threading.Condition()
+
+    def next_slot(self):
+        """
+        Returns the index of the slot the writer can fill.
+        """
+        with self._cond:
+            slot = (self._newest + 1) % self.capacity
+            if slot == self._newest:
+                slot = (slot + 1) % self.capacity
+            return slot
+
+    def slot(self, index):
+        """
+        Returns the (writable) image of a slot.
+        """
+        return self._frames[index]
+
+    def commit(self, index, timestamp, generation):
+        """
+        Publishes a filled slot as the newest frame and wakes up the waiting reader.
+
+        Args:
+            index (int): The slot index.
+            timestamp (float): The monotonic time when the screenshot was taken.
+            generation (int): The mouse input count when the screenshot was taken.
+        """
+        with self._cond:
+            self._timestamps[index] = timestamp
+            self._generations[index] = generation
+            self._newest = index
+            self._cond.notify_all()
+
+    def latest(self, newer_than=None, min_generation=None, timeout=None):
+        """
+        Copies the newest frame, waiting for it if needed.
+
+        Args:
+            newer_than (float): Wait for a frame taken after this monotonic time.
+            min_generation (int): Wait for a frame taken after this mouse input count.
+            timeout (float): The maximum time to wait (in seconds).
+
+        Returns:
+            tuple or None: (image, timestamp, generation) or None on timeout.
+        """
+
+        def ready():
+            if self._newest < 0:
+                return False
+            if newer_than is not None and self._timestamps[self._newest] <= newer_than:
+                return False
+            if (
+                min_generation is not None
+                and self._generations[self._newest] < min_generation
+            ):
+                return False
+            return True
+
+        with self._cond:
+            if not self._cond.wait_for(ready, timeout):
+                return None
+            return (
+                self._frames[self._newest].copy(),
+                self._timestamps[self._newest],
+                self._generations[self._newest],
+            )
+
+
+class CaptureService:
+    """
+    Grabs a part of the screen on a dedicated thread at 'fps' frames per second.
+
+    The area to grab and the size of the frames are set by the reader with 'follow'
+    (the window can move or be resized); the ring buffer is reallocated when the
+    frame size changes.
+    """
+
+    def __init__(self, fps=10, capacity=4):
+        """
+        Args:
+            fps (float): The number of screenshots per second.
+            capacity (int): The number of frames kept in the ring buffer.
+        """
+        self.interval = 1 / fps
+        self.capacity = capacity
+        self.buffer = None
+        self.region = None
+        self.size = None
+        self.__running = False
+        self.thread = None
+
+    def follow(self, region, size):
+        """
+        Sets the area to capture.
+
+        Args:
+            region (tuple): (left, top, width, height) of the area, in absolute screen coordinates.
+            size (tuple): (width, height) of the frames written into the buffer.
+        """
+        region, size = tuple(region), tuple(size)
+        if region == self.region and size == self.size:
+            return
+        if self.buffer is None or self.buffer.shape != (size[1], size[0]):
+            self.buffer = FrameRingBuffer(self.capacity, size[1], size[0])
+        self.region = region
+        self.size = size
+        log.debug("Capture service follows %s (frames: %s)", region, size)
+
+    def latest(self, newer_than=None, min_generation=None, timeout=None):
+        """
+        Copies the newest frame of the buffer (see FrameRingBuffer.latest).
+
+        Returns:
+            tuple or None: (image, timestamp, generation) or None if no frame is available.
+        """
+        buffer = self.buffer
+        if buffer is None or not self.__running:
+            return None
+        return buffer.latest(newer_than, min_generation, timeout)
+
+    @property
+    def running(self):
+        """True if the capture thread is running."""
+        return self.__running
+
+    def start(self):
+        """
+        Starts the capture thread.
+        """
+        log.info("Starting capture service (%s fps)", round(1 / self.interval, 1))
+        self.__running = True
+        self.thread = threading.Thread(
+            target=self.run, name="CaptureService", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops the capture thread.
+        """
+        self.__running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        """
+        Capture loop. mss has to be created in the thread using it.
+        """
+        with mss.mss() as sct:
+            while self.__running:
+                start = time.monotonic()
+                try:
+                    self.grab(sct)
+                except Exception as error:
+                    log.warning("Capture service: screenshot failed: %s", error)
+                time.sleep(max(0, self.interval - (time.monotonic() - start)))
+
+    def grab(self, sct):
+        """
+        Takes one screenshot and writes it (in grayscale) into the ring buffer.
+
+        Args:
+            sct: The mss instance of the capture thread.
+        """
+        region, size, buffer = self.region, self.size, self.buffer
+        if region is None or buffer is None or buffer.shape != (size[1], size[0]):
+            return
+
+        left, top, width, height = region
+        generation = input_count()
+        timestamp = time.monotonic()
+        sct_img = sct.grab({"top": top, "left": left, "width": width, "height": height})
+        # view on the mss buffer, no copy
+        img = np.frombuffer(sct_img.raw, np.uint8).reshape(
+            sct_img.height, sct_img.width, 4
+        )
+
+        slot = buffer.next_slot()
+        if (sct_img.width, sct_img.height) != size:
+            img = cv2.resize(img, size, interpolation=cv2.INTER_CUBIC)
+        cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY, dst=buffer.slot(slot))
+        buffer.commit(slot, timestamp, generation)
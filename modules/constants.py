@@ -163,7 +163,6 @@ class Button(ImageFragment):
     keep = "take"
     lockin = "lockin"
     num = "num"
-    ok = "ok"
     onedie = "num"
     pick = "pick"
     play = "play"
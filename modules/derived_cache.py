@@ -0,0 +1,129 @@
+"""
+This module provides the cache of the data derived from the templates (scaled images,
+pyramid levels...) saved between two runs of the bot.
+
+Entries are keyed by template file, hash of the template and kind of data, in a NumPy
+.npz file per window size and engine version: an entry computed from a template that
+changed since is never used (and is dropped).
+
+Classes:
+- DerivedCache: A persisted cache of arrays derived from the templates.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def array_hash(array):
+    """Returns a short hash of the content of an image."""
+    return hashlib.sha1(np.ascontiguousarray(array).data).hexdigest()[:16]
+
+
+class DerivedCache:
+    """
+    Arrays derived from the templates, saved in an .npz file. The saved arrays are read
+    from the file when they're needed only; the new ones are kept in memory until 'save'.
+    """
+
+    def __init__(self, filename):
+        """
+        Opens the cache saved in 'filename' (if it exists).
+
+        Args:
+            filename (str): The .npz file of the cache.
+        """
+        self.filename = filename
+        self._saved = None
+        self._keys = {}
+        self._new = {}
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        """Opens the saved file and indexes its entries by (file, kind)."""
+        self._saved, self._keys = None, {}
+        if not os.path.isfile(self.filename):
+            return
+        try:
+            self._saved = np.load(self.filename, allow_pickle=False)
+        except (OSError, ValueError) as error:
+            log.warning("Ignoring derived cache %s: %s", self.filename, error)
+            return
+        for key in self._saved.files:
+            file, _, kind = self.split_key(key)
+            self._keys[(file, kind)] = key
+
+    @staticmethod
+    def make_key(file, digest, kind):
+        # '/' would be a directory in the .npz (zip) file
+        return "|".join((file.replace("/", ":"), digest, kind))
+
+    @staticmethod
+    def split_key(key):
+        file, digest, kind = key.split("|")
+        return file.replace(":", "/"), digest, kind
+
+    def get(self, file, digest, kind, compute):
+        """
+        Gets an entry, computing it if it isn't cached (or was computed from another
+        version of the template).
+
+        Args:
+            file (str): The template file.
+            digest (str): The hash of the template (see array_hash).
+            kind (str): The kind of data (like "scaled" or "pyramid1").
+            compute (function): Called without argument to compute the array.
+
+        Returns:
+            numpy.ndarray: The array.
+        """
+        key = self.make_key(file, digest, kind)
+        with self._lock:
+            if key in self._new:
+                return self._new[key]
+            if self._keys.get((file, kind)) == key:
+                try:
+                    return self._saved[key]
+                except (OSError, ValueError, KeyError) as error:
+                    log.warning("Derived cache %s: %s", self.filename, error)
+
+        array = compute()
+        with self._lock:
+            self._new[key] = array
+            # drop the entry of the previous version of the template
+            self._keys[(file, kind)] = key
+        return array
+
+    def save(self):
+        """
+        Saves the new entries with the saved ones still valid.
+        """
+        with self._lock:
+            if not self._new:
+                return
+            arrays = {}
+            if self._saved is not None:
+                for key in self._saved.files:
+                    file, _, kind = self.split_key(key)
+                    if self._keys.get((file, kind)) == key:
+                        arrays[key] = self._saved[key]
+                # closed first: an open file can't be replaced on Windows
+                self._saved.close()
+            arrays.update(self._new)
+            tmpfile = f"{self.filename}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+                with open(tmpfile, "wb") as descriptor:
+                    np.savez(descriptor, **arrays)
+                os.replace(tmpfile, self.filename)
+                self._new = {}
+                log.debug("%s entries saved in %s", len(arrays), self.filename)
+            except OSError as error:
+                log.warning("Couldn't save derived cache %s: %s", self.filename, error)
+            self._open()
@@ -14,7 +14,13 @@ from modules.utils import rsleep
 
 from .constants import Action, Button, UIElement
 from .game import countdown, wait_until_timeout
-from .image_utils import find_element, save_screenshot
+from .image_utils import (
+    find_element,
+    find_elements,
+    find_elements_by_hue,
+    preload_images,
+    save_screenshot,
+)
 from .log_board import LogHSMercs
 from .mouse_utils import mouse_click, move_mouse, move_mouse_and_click
 from .platforms import windowMP
@@ -25,6 +31,19 @@ log = logging.getLogger(__name__)
 default_ability_section = "Mercenary"
 ability_section = default_ability_section
 
+# UIElement of each field of Enemies
+ENEMY_ROLES = ["red", "green", "blue", "noclass", "noclass2", "sob"]
+# images looked for during a battle (loaded in memory when it starts)
+BATTLE_TEMPLATES = [getattr(UIElement, role).filename for role in ENEMY_ROLES] + [
+    Button.allready.filename,
+    Button.fight.filename,
+    Button.num.filename,
+    UIElement.hourglass.filename,
+    UIElement.lose.filename,
+    UIElement.win.filename,
+    UIElement.win_final.filename,
+]
+
 
 class Enemies(
     namedtuple("Enemies", ["red", "green", "blue", "noclass", "noclass2", "mol"])
@@ -646,16 +665,21 @@ def find_enemies(ns=True) -> Enemies:
         An instance of the Enemies class containing the count of different enemy types.
 
     """
-    # Get the window geometry once
-    window_geometry = windowMP()
-
-    # Find all enemy types
-    enemyred = find_enemy("red", window_geometry, ns)
-    enemygreen = find_enemy("green", window_geometry, ns)
-    enemyblue = find_enemy("blue", window_geometry, ns)
-    enemynoclass = find_enemy("noclass", window_geometry, ns)
-    enemynoclass2 = find_enemy("noclass2", window_geometry, ns)
-    enemymol = find_enemy("sob", window_geometry, ns)
+    # Find all enemy types (on the same screenshot)
+    files = [getattr(UIElement, role).filename for role in ENEMY_ROLES]
+    if settings_dict["hue_prefilter"]:
+        # the badges are looked for around the blobs of their colors only
+        results = find_elements_by_hue(files, None if ns is True else ns)
+    else:
+        results = find_elements(files, new_screen=ns)
+    (
+        enemyred,
+        enemygreen,
+        enemyblue,
+        enemynoclass,
+        enemynoclass2,
+        enemymol,
+    ) = (result.random_coords() if result.found else None for result in results)
 
     log.info(
         "Enemies : red %s - green %s - blue %s - noclass %s - noclass2 %s - mol %s",
@@ -672,29 +696,6 @@ def find_enemies(ns=True) -> Enemies:
     )
 
 
-def find_enemy(enemy_role, window_geometry, ns=True):
-    """
-    Finds the coordinates of an enemy on the game screen.
-
-    Args:
-        enemy_role (str): The role of the enemy to find.
-        window_geometry (tuple): The geometry of the game window.
-        ns (bool, optional): Determines whether to use a new screenshot for the search. Default is True.
-
-    Returns:
-        tuple or None: The coordinates (x, y) of the enemy if found, None otherwise.
-    """
-    enemy = find_element(
-        getattr(UIElement, enemy_role).filename, Action.get_coords, new_screen=ns
-    )
-    if enemy:
-        enemy = (
-            enemy[0],
-            enemy[1],
-        )
-    return enemy
-
-
 def battle(zoneLog=None):
     """
     Simulate battles between the cards on the battlefield until one of your cards dies.
@@ -854,6 +855,8 @@ def selectCardsInHand(zL=None):
     retour = True
     global ability_section
 
+    preload_images(BATTLE_TEMPLATES, (windowMP()[2], windowMP()[3]))
+
     # while not find_element(Button.num.filename, Action.screenshot):
     #    rsleep(2)
     wait_until_timeout(Button.num, 60, 2)
@@ -863,9 +866,8 @@ def selectCardsInHand(zL=None):
         # check if Zone.log was erased so we need to go back
         zL.find_battle_start_log()
         zL.start()
-        while not zL.eof:
-            # print("Reaching Zone.log end before starting")
-            rsleep(1)
+        # Reaching Zone.log end before starting
+        zL.wait_eof()
 
         # check if HS is ready for the battle
         # and check logs to find
@@ -37,6 +37,19 @@ class UnsetGameDirectory(SettingsError):
     """
 
 
+class MissingTemplate(MercenariesFarmBaseException):
+    """
+    Raised when an image needed by the bot is missing for the resolution (and locale) in use.
+    """
+
+
+class StuckState(MercenariesFarmBaseException):
+    """
+    Raised when a state machine stays in a state longer than its timeout and the state
+    has no transition for it: the game is stuck on a screen the bot can't handle.
+    """
+
+
 class WindowManagerError(MercenariesFarmBaseException):
     """
     Raised when there is an issue with the window manager in the MercenariesFarm application.
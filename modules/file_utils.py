@@ -18,6 +18,7 @@ Imported Modules:
 
 Functions:
     - readjson(): Reads a JSON file and returns the data.
+    - writejson(): Writes data into a JSON file.
     - read_ini_to_dict(): Reads an INI file and returns the parsed dictionary.
     - parseINI(): Transforms values into the appropriate type based on the input dictionary from an INI file.
     - readINI(): Reads an INI file and returns the data.
@@ -44,6 +45,15 @@ def readjson(jfile):
     return data
 
 
+def writejson(jfile, data):
+    """Writes data into a JSON file (through a temporary file so it's never left half written)."""
+    os.makedirs(os.path.dirname(jfile) or ".", exist_ok=True)
+    tmpfile = f"{jfile}.tmp"
+    with open(tmpfile, "w", encoding="utf-8") as descriptor:
+        json.dump(data, descriptor, indent=4)
+    os.replace(tmpfile, jfile)
+
+
 def read_ini_to_dict(inifile):
     """Reads an INI file and returns the parsed dictionary."""
     log.debug("Reading %s", inifile)
@@ -8,7 +8,7 @@ import sys
 import time
 
 from modules.constants import Action, Button, UIElement
-from modules.image_utils import find_element
+from modules.image_utils import find_element, wait_for
 from modules.mouse_utils import mouse_position, move_mouse, move_mouse_and_click
 from modules.platforms import windowMP
 from modules.reconnects import click_reconnect, game_closed
@@ -34,17 +34,8 @@ def wait_until_timeout(image, duration, step=0.5):
     but if the bot doesn't find it, try to go further
     if you can find another part that it could recognize
     """
-    retour = False
-
     log.info("Waiting (%ss max) for : %s", str(duration), image)
-    for _ in range(int(duration / step)):
-        rsleep(step)
-        # rsleep(0.5)
-        if find_element(image.filename, Action.screenshot):
-            retour = True
-            break
-
-    return retour
+    return wait_for([image], duration, step) is not None
 
 
 def defaultCase():
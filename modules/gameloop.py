@@ -9,10 +9,9 @@ import time
 
 from modules.bounty import goToEncounter, selectGroup, travelToLevel
 from modules.campfire import look_at_campfire_completed_tasks
-from modules.constants import Action, Button, UIElement
 from modules.game import defaultCase
-from modules.image_utils import find_element
-from modules.mouse_utils import move_mouse
+from modules.image_utils import capture_session, invalidate_frame
+from modules.mouse_utils import move_mouse, move_mouse_and_click
 from modules.platforms import windowMP
 from modules.reconnects import (
     choose_mode,
@@ -21,74 +20,90 @@ from modules.reconnects import (
     game_closed,
 )
 from modules.resolution import check_resolution
+from modules.screens import classify_screen
 from modules.settings import jposition
 from modules.travelpoint import travelpointSelection
 from modules.utils import rsleep
 
 log = logging.getLogger(__name__)
 
+# seconds to wait on an unknown screen before looking at the game again
+UNKNOWN_SCREEN_PAUSE = 1
 
-def where():
-    """Try to enter in Mercenaries mode,
-    detect where the bot have to resume and go for it"""
-    start_time = time.time()
 
-    # Check Hearthstone resolution and compare it to settings resolution
-    _, _, width, height = windowMP()
-    win_game_resolution = f"{width}x{height}"
-    if not check_resolution(width, height):
-        log.error(
-            "Game window size (%s) doesn't match your settings.", win_game_resolution
-        )
-        sys.exit()
+def click_screen(state):
+    """Click on the element identifying the screen"""
+    x, y = state.result.random_coords()
+    move_mouse_and_click(windowMP(), x, y)
+    invalidate_frame()
 
-    find_element(UIElement.click_to_start.filename, Action.move_and_click)
 
-    find_element(Button.join_button.filename, Action.move_and_click)
+def enter_adventure(state):
+    """Click on the PVE adventure (paid, free or portal)
+    and move the mouse away"""
+    click_screen(state)
+    mx = jposition["mouse.neutral.x"]
+    my = jposition["mouse.neutral.y"]
+    move_mouse(windowMP(), windowMP()[2] / mx, windowMP()[3] / my)
 
-    if find_element(Button.choose_mode.filename, Action.screenshot):
-        choose_mode()
 
+def enter_bounty(state):
+    """Choose the bounty (level) to farm"""
+    travelToLevel()
+    rsleep(1)
 
-    # Find PVE adventure paid, free or portal
-    if (
-        find_element(UIElement.battle_portal.filename, Action.move_and_click)
-        or find_element(UIElement.battle.filename, Action.move_and_click)
-        or find_element(UIElement.free_battle.filename, Action.move_and_click)
-    ):
-        mx = jposition["mouse.neutral.x"]
-        my = jposition["mouse.neutral.y"]
-        move_mouse(windowMP(), windowMP()[2] / mx, windowMP()[3] / my)
 
-    if find_element(UIElement.travelpoint.filename, Action.screenshot):
-        # Find the travel point and the mode (normal/heroic)
-        travelpointSelection()
+def enter_group(state):
+    """Choose the party of mercenaries"""
+    selectGroup()
+    rsleep(1)
 
-    if find_element(UIElement.bounties.filename, Action.screenshot):
-        travelToLevel()
-        rsleep(1)
 
-    if find_element(UIElement.team_selection.filename, Action.screenshot):
-        selectGroup()
-        rsleep(1)
+def default_screen(state):
+    """Unknown screen or popup (quests, ...)"""
+    defaultCase()
 
-    if find_element(UIElement.view_party.filename, Action.screenshot):
-        goToEncounter()
 
-    if find_element(UIElement.campfire.filename, Action.screenshot):
-        look_at_campfire_completed_tasks()
+# what to do on each screen (see screens.SCREENS)
+SCREEN_HANDLERS = {
+    "reconnect_button": lambda state: click_reconnect(),
+    "game_closed": lambda state: game_closed(),
+    "partywipe": lambda state: click_wipe_button(),
+    "click_to_start": click_screen,
+    "join_button": click_screen,
+    "choose_mode": lambda state: choose_mode(),
+    "battle_portal": enter_adventure,
+    "battle": enter_adventure,
+    "free_battle": enter_adventure,
+    "travelpoint": lambda state: travelpointSelection(),
+    "bounties": enter_bounty,
+    "team_selection": enter_group,
+    "view_party": lambda state: goToEncounter(),
+    "campfire": lambda state: look_at_campfire_completed_tasks(),
+}
 
-    if find_element(UIElement.partywipe.filename, Action.screenshot):
-        click_wipe_button()
 
-    if find_element(UIElement.reconnect_button.filename, Action.screenshot):
-        click_reconnect()
+def where():
+    """Try to enter in Mercenaries mode,
+    detect where the bot have to resume and go for it"""
+    start_time = time.time()
 
-    if find_element(UIElement.game_closed.filename, Action.screenshot):
-        game_closed()
+    # Check Hearthstone resolution and compare it to settings resolution
+    _, _, width, height = windowMP()
+    win_game_resolution = f"{width}x{height}"
+    if not check_resolution(width, height):
+        log.error(
+            "Game window size (%s) doesn't match your settings.", win_game_resolution
+        )
+        sys.exit()
 
-    else:
-        defaultCase()
+    # one frame, one screen: go straight to its handler
+    with capture_session():
+        state = classify_screen()
+        handler = SCREEN_HANDLERS.get(state.name, default_screen)
+        handler(state)
+    if not state.known:
+        rsleep(UNKNOWN_SCREEN_PAUSE)
 
     duration = time.time() - start_time
     if duration < 20:
@@ -0,0 +1,169 @@
+"""
+This module provides a bounded in-memory cache for images.
+
+Classes:
+- ImageCache: A least recently used cache with a size budget in bytes.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+def nbytes(value):
+    """
+    Gets the memory used by a cached value: an image, a tuple of images, or None.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, tuple):
+        return sum(nbytes(item) for item in value)
+    return getattr(value, "nbytes", 0)
+
+
+class ImageCache:
+    """
+    A least recently used cache of images, keeping at most 'max_bytes' of images
+    (and 'max_items' images): the least recently used images are dropped to make
+    room for new ones.
+    Hits, misses and evictions are counted (see stats).
+    """
+
+    def __init__(self, name, max_bytes, max_items=0):
+        """
+        Args:
+            name (str): The name of the cache (for the logs).
+            max_bytes (int): The size budget of the cache (0 for no limit).
+            max_items (int): The maximum number of images (0 for no limit).
+        """
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, load):
+        """
+        Gets an image, loading it if it isn't in the cache.
+
+        Args:
+            key: The key of the image (like its file path).
+            load (function): Called with 'key' to load the image when it isn't cached.
+
+        Returns:
+            The cached value.
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+
+        # loaded without the lock: other threads keep using the cache meanwhile
+        value = load(key)
+        self.put(key, value)
+        return value
+
+    def lookup(self, key):
+        """
+        Gets an image without loading it.
+
+        Args:
+            key: The key of the image.
+
+        Returns:
+            The cached value, or None if it isn't in the cache.
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """
+        Adds (or replaces) an image, evicting the least recently used ones if needed.
+
+        Args:
+            key: The key of the image.
+            value: The image (or a tuple of images).
+        """
+        with self._lock:
+            if key in self._items:
+                self.size -= nbytes(self._items.pop(key))
+            self._items[key] = value
+            self.size += nbytes(value)
+            while len(self._items) > 1 and (
+                (self.max_bytes and self.size > self.max_bytes)
+                or (self.max_items and len(self._items) > self.max_items)
+            ):
+                _, evicted = self._items.popitem(last=False)
+                self.size -= nbytes(evicted)
+                self.evictions += 1
+
+    def preload(self, keys, load):
+        """
+        Loads images in the cache before they're needed (like the images of a battle).
+
+        Args:
+            keys (iterable): The keys of the images.
+            load (function): Called with a key to load an image.
+        """
+        for key in keys:
+            self.get(key, load)
+        self.log_stats()
+
+    def items(self):
+        """
+        Returns:
+            list: The (key, value) pairs of the cache, from the least recently used.
+        """
+        with self._lock:
+            return list(self._items.items())
+
+    def clear(self):
+        """Drops every image (the statistics are kept)."""
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: The number of images, the size, the hits, misses and evictions of the cache.
+        """
+        return {
+            "images": len(self._items),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def log_stats(self):
+        """Logs the statistics of the cache."""
+        log.debug(
+            "%s cache: %s images, %.1f/%.1f MB, %s hits, %s misses, %s evictions",
+            self.name,
+            len(self._items),
+            self.size / 2**20,
+            self.max_bytes / 2**20,
+            self.hits,
+            self.misses,
+            self.evictions,
+        )
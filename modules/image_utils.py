@@ -3,28 +3,102 @@ This module provides functions for image processing and finding elements on the
 
 Functions:
 - get_resolution: Get the resolution of the screen.
+- parse_resolution: Get the width and height of a resolution setting.
 - resize: Resize an image.
+- open_template_atlas: Open (and build if needed) the template atlas.
 - get_gray_image: Load an OpenCV version of an image in memory and/or return it.
+- load_gray_image: Load an OpenCV version of an image.
+- get_mask: Convert the alpha channel of an image into a mask.
+- get_signature: Get the signature (a few pixels) of an image.
+- quick_reject: Check the signature of a template at its usual place.
+- get_sparse_samples: Get the pixels of a masked image compared first.
+- get_images_resolution: Get the resolution of the images used as templates.
+- get_scaled_gray_image: Get an image scaled to the game window size.
+- scale_gray_image: Scale an image to the game window size.
+- get_template_hash: Get the hash of an image.
+- open_derived_cache: Open the cache of the data derived from the images for a window size.
+- get_derived_cache: Get the cache of the data derived from the images.
+- save_derived_cache: Save the data derived from the images.
+- preload_images: Load images in memory before they're needed.
+- get_pyramid_level: Get the pyramid level used to look for a template.
+- get_pyramid_image: Get a downscaled image for the pyramid search.
+- use_fft: Check if a template should be matched in the frequency domain.
+- get_spectrum_image: Get the spectrum of an image for the frequency domain search.
+- get_hue_histogram: Get the hue histogram of an image for the color prefilter.
+- get_edge_image: Get the edge points of an image for the chamfer matching.
+- capture_frame: Capture the game window (or a part of it) as a grayscale Frame.
+- capture_session: Share one Frame between several probes.
+- get_frame: Get the Frame used by the next probe.
+- start_capture_service: Start capturing the game window in the background.
+- stop_capture_service: Stop the background capture.
 - find_element: Find an object on the screen and perform actions.
 - find_element_from_file: Find element center from a template file.
+- find_elements: Find several elements on the same screenshot.
+- wait_for: Wait for one of several elements to appear on the screen.
+- find_all_elements: Find all the occurrences of an element on the screen.
+- find_elements_by_hue: Find several colored elements, around the blobs of their colors only.
+- get_template_registry: Get the template registry (path and threshold of the templates).
+- load_template_registry: Build the template registry and check the images used by the bot.
+- get_threshold: Get the matching threshold of a template.
+- get_template_path: Get the path of a template file.
+- match_on_frame: Look for a template on a frame.
+- match_all_on_frame: Look for all the occurrences of a template on a frame.
+- get_match_pool: Get the thread pool used to match several templates at the same time.
+- match_batch: Match several templates on the matching thread pool.
 - part_screen: Take a screenshot for a part of the screen.
 - find_element_center_on_screen: Find element center on the screen.
+- locate: Find the best match of a template, in its region of interest first.
+- locate_edges: Find the best match of the edges of a template, in its region of interest first.
+- best_match: Find the best match of a template in an image (or in a part of it).
 """
 
 
+import atexit
+import functools
 import logging
 import os.path
 import random
 import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import mss
 import numpy as np
 
-from modules.constants import Action
-from modules.mouse_utils import move_mouse, move_mouse_and_click
+from modules.atlas import TemplateAtlas, atlas_is_stale, build_atlas
+from modules.capture import CaptureService
+from modules.constants import Action, Button, UIElement
+from modules.derived_cache import DerivedCache, array_hash
+from modules.image_cache import ImageCache
+from modules.matching import (
+    ENGINE_VERSION,
+    DistanceMap,
+    FrameSpectrum,
+    color_blobs,
+    downscale,
+    edge_distance,
+    edge_kernel,
+    edge_map,
+    fingerprint,
+    get_template_spectrum,
+    hue_candidates,
+    hue_histogram,
+    match_all,
+    match_full,
+    match_masked,
+    match_pyramid,
+    signature_difference,
+    sparse_samples,
+    unchanged,
+)
+from modules.mouse_utils import input_count, move_mouse, move_mouse_and_click
 from modules.platforms import windowMP
+from modules.roi_index import RoiIndex
 from modules.settings import jthreshold, settings_dict
+from modules.template_registry import TemplateRegistry
 
 sct = mss.mss()
 # workaround end
@@ -37,6 +111,41 @@ mss is needed as workaround for Linux
 
 log = logging.getLogger(__name__)
 
+# margin (in pixels of a 1920 pixels wide frame) added around the learned regions of interest
+ROI_MARGIN = 40
+# smallest side (in pixels) of a downscaled template for the pyramid search
+PYRAMID_MIN_SIZE = 12
+# coarse peaks scoring less than 'threshold - PYRAMID_SLACK' aren't refined
+PYRAMID_SLACK = 0.15
+# pixels of the signature of a template, compared at its usual place by quick_reject
+SIGNATURE_SAMPLES = 16
+# mean gray level difference above which a signature doesn't match
+SIGNATURE_MAX_DIFF = 40
+# a ROI larger than its template by more than this means the template moves
+SIGNATURE_SLACK = 4
+# signatures rejected in a row before searching the whole frame (the element may have moved)
+SIGNATURE_RECHECK = 10
+# pixels with a lower alpha are transparent (not compared)
+ALPHA_OPAQUE = 128
+# templates covering at least this part of the frame are matched in the frequency domain
+FFT_MIN_AREA_RATIO = 0.007
+# templates with less colored pixels than this part of their area aren't prefiltered by hue
+HUE_MIN_COLORED = 0.1
+# blobs with less pixels of the hues of a template than this part of its colored pixels are skipped
+HUE_MIN_RATIO = 0.5
+# more blobs than this for a template: the whole frame is searched
+HUE_MAX_CANDIDATES = 6
+# results of match_on_frame kept to be reused on unchanged frames (and their memory)
+MATCH_MEMO_RESULTS = 512
+MATCH_MEMO_BYTES = 16 * 2**20
+# seconds between two frames of wait_for right after the screen changed
+WAIT_MIN_INTERVAL = 0.1
+# maximum seconds between two frames of wait_for (the screen being unchanged)
+WAIT_MAX_INTERVAL = 1
+roi_index = RoiIndex(f"{settings_dict['cache_dir']}/roi_index.json")
+# signatures rejected in a row, by (frame size, template) (see quick_reject)
+signature_rejects = {}
+
 
 class ResolutionError(Exception):
     """Exception raised for resolution-related errors."""
@@ -56,9 +165,8 @@ def get_resolution() -> tuple[str, int, int, float]:
     """
     try:
         resolution = settings_dict["resolution"]
-        setting_size = resolution.split("x")
-        setting_w, setting_h = int(setting_size[0]), int(setting_size[1])
-        windows_w, windows_h = windowMP()[2], windowMP()[3]
+        setting_w, setting_h = parse_resolution(resolution)
+        windows_w = windowMP()[2]
         # if round(windows_w / setting_w, 2) != round(windows_h / setting_h, 2):
         #     log.warning(f"Setting resolution: {resolution} | Window resolution: {windows_w}x{windows_h}")
         scale_size = setting_w / windows_w
@@ -80,6 +188,21 @@ def get_resolution() -> tuple[str, int, int, float]:
         sys.exit(1)
 
 
+@functools.lru_cache
+def parse_resolution(resolution):
+    """
+    Gets the width and height of a resolution setting.
+
+    Args:
+    resolution (str): The resolution (like "1920x1080").
+
+    Returns:
+    tuple: (width, height)
+    """
+    width, height = resolution.split("x")
+    return int(width), int(height)
+
+
 def resize(img, width, height):
     """
     Resizes an image.
@@ -96,46 +219,792 @@ def resize(img, width, height):
     return cv2.resize(img, (width, height), interpolation=cv2.INTER_CUBIC)
 
 
+def get_images_resolution():
+    """
+    Gets the resolution of the images used as templates: the images made for
+    the default resolution (1920x1080) when they're scaled in memory (see the
+    'scale_in_memory' setting), the images generated for the setting resolution otherwise.
+
+    Returns:
+    str: The resolution (like "1920x1080").
+    """
+    if settings_dict["scale_in_memory"]:
+        return settings_dict["default_resolution"]
+    return settings_dict["resolution"]
+
+
+template_atlas = None
+gray_images = ImageCache("Images", settings_dict["image_cache_mb"] * 2**20)
+scaled_images = ImageCache("Scaled images", settings_dict["image_cache_mb"] * 2**20)
+pyramid_images = ImageCache("Pyramid images", settings_dict["image_cache_mb"] * 2**20)
+# a spectrum is as big as a frame (8 MB in 1920x1080)
+spectrum_images = ImageCache("Spectra", settings_dict["image_cache_mb"] * 2**22)
+
+
+def open_template_atlas():
+    """
+    Opens the template atlas (see modules.atlas), building it first if an image was
+    added or modified since it was built. To call once the images of the setting
+    resolution are generated. Nothing is done if the 'template_atlas' setting is False.
+    """
+    global template_atlas
+    if not settings_dict["template_atlas"]:
+        return
+    root_dir = settings_dict["root_images_dir"]
+    filename = f"{settings_dict['cache_dir']}/templates.atlas"
+    try:
+        if atlas_is_stale(root_dir, filename):
+            build_atlas(root_dir, filename)
+        template_atlas = TemplateAtlas(filename)
+    except (OSError, ValueError) as error:
+        log.warning("Template atlas not available, using the image files: %s", error)
+        template_atlas = None
+
+
 def get_gray_image(file):
     """
     Loads a grayscale OpenCV version of an image in memory or returns it if it's already in memory.
+    The images are kept in the 'gray_images' cache (see the 'image_cache_mb' setting).
 
     Args:
     file (str): The file path of the image.
 
     Returns:
-    numpy.ndarray: The grayscale image.
+    tuple: The grayscale image and its mask (or None).
     """
 
-    if not hasattr(get_gray_image, "imagesInMemory"):
-        get_gray_image.imagesInMemory = {}
-    if not hasattr(get_gray_image, "maskInMemory"):
-        get_gray_image.maskInMemory = {}
+    return gray_images.get(file, load_gray_image)
+
 
-    # To Do : to resize the image so we can support other resolutions
-    # screenshots was made on a 1920x1080 screen resolution
-    # but with Hearthstone in windowed mode so it's like : 1920x1040
-    # need to resize the image in memory
-    if file not in get_gray_image.imagesInMemory:
+def load_gray_image(file):
+    """
+    Loads a grayscale OpenCV version of an image, from the template atlas when it's
+    open (see open_template_atlas) or from the file, with the mask made from its
+    transparent pixels (see get_mask).
+
+    Args:
+    file (str): The file path of the image.
+
+    Returns:
+    tuple: The grayscale image and its mask (or None).
+    """
+    if template_atlas is not None and file in template_atlas:
+        image, alpha = template_atlas.get(file)
+    else:
         if not os.path.isfile(file):
             log.error('Err: file "%s" doesn\'t exist.', file)
-        get_gray_image.imagesInMemory[file] = cv2.imread(file, cv2.IMREAD_GRAYSCALE)
-        log.debug("images in memory : %s", len(get_gray_image.imagesInMemory))
-    # if file not in get_gray_image.maskInMemory:
-    #     # read alpha channel
-    #     image = cv2.imread(file, cv2.IMREAD_UNCHANGED)
-    #     try:
-    #         if image.shape[2] == 4:
-    #             alpha_channel = image[:, :, 3]
-    #             # save the mask in memory
-    #             get_gray_image.maskInMemory[file] = alpha_channel
-    #         else:
-    #             # no alpha channel
-    #             get_gray_image.maskInMemory[file] = None
-    #     except IndexError:
-    #         # no alpha channel
-    #         get_gray_image.maskInMemory[file] = None
-    return get_gray_image.imagesInMemory[file], get_gray_image.maskInMemory.get(file)
+        image = cv2.imread(file, cv2.IMREAD_GRAYSCALE)
+        alpha = None
+        if image is not None:
+            colors = cv2.imread(file, cv2.IMREAD_UNCHANGED)
+            if colors.ndim == 3 and colors.shape[2] == 4:
+                alpha = colors[:, :, 3]
+    return image, get_mask(alpha)
+
+
+def get_mask(alpha):
+    """
+    Converts the alpha channel of an image into the mask used to match it:
+    only the (mostly) opaque pixels are compared.
+
+    Args:
+    alpha (numpy.ndarray): The alpha channel (or None).
+
+    Returns:
+    numpy.ndarray or None: The mask, or None if the image has no transparent pixel.
+    """
+    if alpha is None or alpha.min() >= ALPHA_OPAQUE:
+        return None
+    return np.where(alpha >= ALPHA_OPAQUE, 255, 0).astype(np.uint8)
+
+
+def get_signature(file, size):
+    """
+    Gets the signature of the image of 'file' scaled to the window size: a few pixels
+    of the image (see matching.sparse_samples), kept in memory like get_scaled_gray_image
+    (and saved in the derived cache).
+
+    Args:
+    file (str): The file path of the image.
+    size (tuple): The (width, height) of the game window.
+
+    Returns:
+    tuple: (ys, xs, values) of the pixels.
+    """
+    template, _ = get_scaled_gray_image(file, size)
+
+    def compute():
+        full_mask = np.full(template.shape[:2], 255, np.uint8)
+        return np.array(sparse_samples(template, full_mask, SIGNATURE_SAMPLES))
+
+    def load(key):
+        cache = get_derived_cache()
+        if cache is None:
+            return tuple(compute())
+        return tuple(cache.get(file, get_template_hash(file), "signature", compute))
+
+    return pyramid_images.get((file, "signature"), load)
+
+
+def quick_reject(frame, file, file_path, roi, window):
+    """
+    Checks the signature (see get_signature) of a template at the place where it was always
+    found (a learned ROI of the size of the template, give or take SIGNATURE_SLACK pixels:
+    the best position of the ROI is kept), for the templates with a signature
+    (see the "signature" list of thresholds.json).
+
+    Args:
+    frame (Frame): The frame to look into.
+    file (str): The template file (like "UI_elements/campfire.png").
+    file_path (str): The file path of the template.
+    roi (list): The learned [x0, y0, x1, y1] region of interest of the template.
+    window (tuple): The game window geometry.
+
+    Returns:
+    bool: True if the template clearly isn't in its ROI (not found, see SIGNATURE_RECHECK).
+    """
+    if not get_template_registry().get(file).signature:
+        return False
+    size = (window[2], window[3])
+    template, _ = get_scaled_gray_image(file_path, size)
+    th, tw = template.shape[:2]
+    if roi[2] - roi[0] - tw > SIGNATURE_SLACK or roi[3] - roi[1] - th > SIGNATURE_SLACK:
+        # the template was found at different places
+        return False
+    signature = get_signature(file_path, size)
+    differences = [
+        signature_difference(frame.image, (x, y), signature)
+        for y in range(roi[1], max(roi[1], roi[3] - th) + 1)
+        for x in range(roi[0], max(roi[0], roi[2] - tw) + 1)
+    ]
+    differences = [difference for difference in differences if difference is not None]
+    return bool(differences) and min(differences) > SIGNATURE_MAX_DIFF
+
+
+def get_sparse_samples(file, size):
+    """
+    Gets the pixels of the masked image of 'file' scaled to the window size compared
+    first by matching.match_masked, kept in memory like get_scaled_gray_image.
+
+    Args:
+    file (str): The file path of the image.
+    size (tuple): The (width, height) of the game window.
+
+    Returns:
+    tuple: (ys, xs, values) of the pixels (see matching.sparse_samples).
+    """
+    template, mask = get_scaled_gray_image(file, size)
+    return pyramid_images.get(
+        (file, "samples"), lambda key: sparse_samples(template, mask)
+    )
+
+
+def get_scaled_gray_image(file, size):
+    """
+    Gets the grayscale image (and mask) of 'file', made for the resolution of the images
+    (see get_images_resolution), scaled to the game window size. Scaled images are computed
+    once and kept in memory for the current window size (and saved in the derived cache,
+    see get_derived_cache); they're computed again when the window is resized.
+
+    Args:
+    file (str): The file path of the image.
+    size (tuple): The (width, height) of the game window.
+
+    Returns:
+    tuple: The scaled grayscale image and its mask (or None).
+    """
+    if getattr(get_scaled_gray_image, "size", None) != size:
+        setting_w, setting_h = parse_resolution(get_images_resolution())
+        get_scaled_gray_image.factors = (size[0] / setting_w, size[1] / setting_h)
+        scaled_images.clear()
+        pyramid_images.clear()
+        spectrum_images.clear()
+        open_derived_cache(size)
+        # set last: other matching threads use the attributes above once it's set
+        get_scaled_gray_image.size = size
+        log.debug(
+            "Window size: %sx%s, images scale: %s",
+            size[0],
+            size[1],
+            get_scaled_gray_image.factors,
+        )
+
+    return scaled_images.get(file, scale_gray_image)
+
+
+def scale_gray_image(file):
+    """
+    Scales the grayscale image (and mask) of 'file' to the current window size
+    (see get_scaled_gray_image), or takes it from the derived cache.
+
+    Args:
+    file (str): The file path of the image.
+
+    Returns:
+    tuple: The scaled grayscale image and its mask (or None).
+    """
+    template, mask = get_gray_image(file)
+    if template is None:
+        return template, mask
+    fx, fy = get_scaled_gray_image.factors
+    width = max(1, round(template.shape[1] * fx))
+    height = max(1, round(template.shape[0] * fy))
+    if (height, width) == template.shape[:2]:
+        return template, mask
+
+    def scale():
+        return resize(template, width, height)
+
+    def scale_mask():
+        return cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+
+    cache = get_derived_cache()
+    if cache is None:
+        return scale(), None if mask is None else scale_mask()
+    digest = get_template_hash(file)
+    template = cache.get(file, digest, "scaled", scale)
+    if mask is not None:
+        mask = cache.get(file, digest, "mask", scale_mask)
+    return template, mask
+
+
+def get_template_hash(file):
+    """
+    Gets the hash of the (grayscale) image of 'file', computed once.
+
+    Args:
+    file (str): The file path of the image.
+
+    Returns:
+    str: The hash of the image (see derived_cache.array_hash).
+    """
+    if file not in get_template_hash.hashes:
+        get_template_hash.hashes[file] = array_hash(get_gray_image(file)[0])
+    return get_template_hash.hashes[file]
+
+
+get_template_hash.hashes = {}
+
+
+def open_derived_cache(size):
+    """
+    Opens the derived cache of a window size (saving the one of the previous size).
+    Nothing is opened if the 'persist_scaled_images' setting is False.
+
+    Args:
+    size (tuple): The (width, height) of the game window.
+    """
+    save_derived_cache()
+    open_derived_cache.cache = None
+    if settings_dict["persist_scaled_images"]:
+        open_derived_cache.cache = DerivedCache(
+            f"{settings_dict['cache_dir']}/derived_{get_images_resolution()}"
+            f"_{size[0]}x{size[1]}_v{ENGINE_VERSION}.npz"
+        )
+
+
+open_derived_cache.cache = None
+
+
+def get_derived_cache():
+    """
+    Gets the cache of the data derived from the templates (scaled images, pyramid levels)
+    for the current window size, saved between two runs in the cache directory.
+
+    Returns:
+    DerivedCache or None: The cache, or None if the 'persist_scaled_images' setting is False.
+    """
+    return open_derived_cache.cache
+
+
+def save_derived_cache():
+    """Saves the new entries of the derived cache (if any)."""
+    if open_derived_cache.cache is not None:
+        open_derived_cache.cache.save()
+
+
+atexit.register(save_derived_cache)
+
+
+def preload_images(files, size=None):
+    """
+    Loads templates in memory before they're needed (like the images of a battle),
+    so the first probes don't have to load them.
+
+    Args:
+    files (list): The template files (like "buttons/play.png").
+    size (tuple): The (width, height) of the game window, to also scale them.
+        Defaults to None (not scaled).
+    """
+    paths = [path for path in map(get_template_path, files) if path is not None]
+    gray_images.preload(paths, load_gray_image)
+    if size is not None:
+        for path in paths:
+            get_scaled_gray_image(path, size)
+        scaled_images.log_stats()
+
+
+def use_fft(template, mask, img):
+    """
+    Checks if a template should be matched in the frequency domain (see FrameSpectrum):
+    only big templates without mask, when the 'fft_matching' setting is enabled.
+
+    Args:
+    template (numpy.ndarray): The template image (scaled to the window size).
+    mask (numpy.ndarray): The mask of the template (or None).
+    img (numpy.ndarray): The frame to look into.
+
+    Returns:
+    bool: True to use the FrameSpectrum of the frame.
+    """
+    return (
+        settings_dict["fft_matching"]
+        and mask is None
+        and template.size >= FFT_MIN_AREA_RATIO * img.size
+    )
+
+
+def get_spectrum_image(file, size, dft_size):
+    """
+    Gets the spectrum of the image of 'file' scaled to the window size, for frames
+    using this DFT size (see FrameSpectrum), kept in the 'spectrum_images' cache.
+    Spectra are as big as the frames: they're never saved.
+
+    Args:
+    file (str): The file path of the image.
+    size (tuple): The (width, height) of the game window.
+    dft_size (tuple): The (height, width) of the DFT of the frames.
+
+    Returns:
+    tuple: (spectrum, energy) of the zero mean image.
+    """
+    template, _ = get_scaled_gray_image(file, size)
+    return spectrum_images.get(
+        (file, dft_size), lambda key: get_template_spectrum(template, dft_size)
+    )
+
+
+def get_pyramid_level(file, template):
+    """
+    Gets the pyramid level used to look for a template: the 'pyramid_level' setting,
+    lowered for small templates, and 0 (no pyramid) for the templates listed in
+    "no_pyramid" in thresholds.json (small icons losing their details when downscaled).
+
+    Args:
+    file (str): The template file (like "buttons/play.png").
+    template (numpy.ndarray): The template image (scaled to the window size).
+
+    Returns:
+    int: The pyramid level (0: full resolution search only).
+    """
+    level = settings_dict["pyramid_level"]
+    if not level or get_template_registry().get(file).no_pyramid:
+        return 0
+    while level and min(template.shape[:2]) >> level < PYRAMID_MIN_SIZE:
+        level -= 1
+    return level
+
+
+def get_pyramid_image(file, size, level):
+    """
+    Gets the image of 'file' scaled to the window size and downscaled 2**level times,
+    kept in memory like get_scaled_gray_image (and saved in the derived cache).
+
+    Args:
+    file (str): The file path of the image.
+    size (tuple): The (width, height) of the game window.
+    level (int): The pyramid level.
+
+    Returns:
+    numpy.ndarray: The downscaled grayscale image.
+    """
+    template, _ = get_scaled_gray_image(file, size)
+
+    def load(key):
+        cache = get_derived_cache()
+        if cache is None:
+            return downscale(template, level)
+        return cache.get(
+            file,
+            get_template_hash(file),
+            f"pyramid{level}",
+            lambda: downscale(template, level),
+        )
+
+    return pyramid_images.get((file, level), load)
+
+
+def get_hue_histogram(file, size):
+    """
+    Gets the hue histogram of the colored image of 'file' scaled to the window size
+    (see matching.hue_histogram), kept in the 'pyramid_images' cache.
+
+    Args:
+    file (str): The file path of the image.
+    size (tuple): The (width, height) of the game window.
+
+    Returns:
+    tuple or None: (histogram, count) the histogram and the number of colored pixels,
+    or None if the image is (mostly) gray.
+    """
+    template, _ = get_scaled_gray_image(file, size)
+
+    def load(key):
+        image = cv2.imread(file, cv2.IMREAD_COLOR)
+        if image is None or template is None:
+            return None
+        if image.shape[:2] != template.shape[:2]:
+            image = resize(image, template.shape[1], template.shape[0])
+        histogram, count = hue_histogram(cv2.cvtColor(image, cv2.COLOR_BGR2HSV))
+        if count < HUE_MIN_COLORED * template.size:
+            return None
+        return histogram, count
+
+    return pyramid_images.get((file, "hue"), load)
+
+
+def get_edge_image(file, size):
+    """
+    Gets the edge points of the image of 'file' scaled to the window size, for the
+    chamfer matching (see matching.DistanceMap), kept in memory like get_pyramid_image
+    (and saved in the derived cache).
+
+    Args:
+    file (str): The file path of the image.
+    size (tuple): The (width, height) of the game window.
+
+    Returns:
+    tuple: (kernel, edge_count, distance) the edge points (see matching.edge_kernel),
+    the number of edge pixels of the image and the distances to its edges
+    (see matching.edge_distance).
+    """
+    template, _ = get_scaled_gray_image(file, size)
+
+    def load(key):
+        cache = get_derived_cache()
+        if cache is None:
+            edges = edge_map(template)
+        else:
+            edges = cache.get(
+                file, get_template_hash(file), "edges", lambda: edge_map(template)
+            )
+        return edge_kernel(edges), cv2.countNonZero(edges), edge_distance(edges)
+
+    return pyramid_images.get((file, "edges"), load)
+
+
+class Frame:
+    """
+    A grayscale capture of the game window (or a part of it).
+
+    Attributes:
+    image (numpy.ndarray): The grayscale image, at the game window size.
+    left (int): The absolute x position of the captured area.
+    top (int): The absolute y position of the captured area.
+    scale_size (float): The scaling factor applied to the capture.
+    generation (int): The mouse input count when the capture was taken.
+    timestamp (float): The monotonic time when the capture was taken.
+    color (numpy.ndarray): The BGR image, or None if only the grayscale image was kept.
+    """
+
+    def __init__(
+        self,
+        image,
+        left,
+        top,
+        scale_size=1,
+        generation=0,
+        timestamp=None,
+        color=None,
+    ):
+        self.image = image
+        self.color = color
+        self.left = left
+        self.top = top
+        self.scale_size = scale_size
+        self.generation = generation
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+        self._spectrum = None
+        self._distance_map = None
+        self._fingerprint = None
+        self._hsv = None
+        self._lock = threading.Lock()
+
+    def get_spectrum(self):
+        """
+        Gets the FrameSpectrum of the frame, computed once for all the templates.
+
+        Returns:
+        FrameSpectrum: The spectrum of the frame.
+        """
+        with self._lock:
+            if self._spectrum is None:
+                self._spectrum = FrameSpectrum(self.image)
+            return self._spectrum
+
+    def get_distance_map(self):
+        """
+        Gets the DistanceMap of the frame, computed once for all the templates
+        matched with their edges.
+
+        Returns:
+        DistanceMap: The distance transform of the edges of the frame.
+        """
+        with self._lock:
+            if self._distance_map is None:
+                self._distance_map = DistanceMap(self.image)
+            return self._distance_map
+
+    @property
+    def fingerprint(self):
+        """The fingerprint of the image, to detect unchanged screens."""
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(self.image)
+        return self._fingerprint
+
+    @property
+    def hsv(self):
+        """The image in the HSV color space (None for a grayscale frame)."""
+        if self._hsv is None and self.color is not None:
+            self._hsv = cv2.cvtColor(self.color, cv2.COLOR_BGR2HSV)
+        return self._hsv
+
+    @property
+    def age(self):
+        """Seconds elapsed since the capture was taken."""
+        return time.monotonic() - self.timestamp
+
+    def is_stale(self, ttl):
+        """
+        Checks if the frame can't be trusted anymore.
+
+        Args:
+        ttl (float): The maximum age (in seconds) of a usable frame.
+
+        Returns:
+        bool: True if the frame is older than 'ttl' or the mouse was used since the capture.
+        """
+        return self.age > ttl or self.generation != input_count()
+
+    def crop(self, region):
+        """
+        Extracts a part of the frame without taking a new screenshot.
+
+        Args:
+        region (list): [width, height, top, left] of the part, in absolute screen coordinates.
+
+        Returns:
+        Frame or None: The part of the frame or None if the region isn't fully inside the frame.
+        """
+        width, height, top, left = region
+        x = round((left - self.left) * self.scale_size)
+        y = round((top - self.top) * self.scale_size)
+        w = int(width * self.scale_size)
+        h = int(height * self.scale_size)
+        if x < 0 or y < 0 or x + w > self.image.shape[1] or y + h > self.image.shape[0]:
+            return None
+        return Frame(
+            self.image[y : y + h, x : x + w],
+            left,
+            top,
+            self.scale_size,
+            self.generation,
+            self.timestamp,
+            None if self.color is None else self.color[y : y + h, x : x + w],
+        )
+
+
+def capture_frame(region=None, newer_than=None, color=False):
+    """
+    Captures the game window (or a part of it) as a grayscale Frame.
+    When the capture service is running, the newest frame of the service is used
+    instead of taking a screenshot.
+
+    Args:
+    region (list): [width, height, top, left] of the part of the screen to capture.
+        Defaults to None (the whole game window).
+    newer_than (float): Wait for a frame taken after this monotonic time. Defaults to None.
+    color (bool): Whether to keep the colors of the capture (see Frame.color).
+        The capture service only keeps grayscale frames: a screenshot is taken.
+        Defaults to False.
+
+    Returns:
+    Frame: The captured frame.
+    """
+    # frames aren't resized: the images are scaled to the window size instead
+    # (see get_scaled_gray_image)
+    scale_size = 1
+    generation = input_count()
+    window = windowMP()
+
+    if not color and _capture_service is not None and _capture_service.running:
+        _capture_service.follow(window, (window[2], window[3]))
+        # wait (a bit) for a screenshot taken after the last mouse input
+        latest = _capture_service.latest(
+            newer_than,
+            generation,
+            timeout=CAPTURE_SERVICE_TIMEOUT,
+        )
+        if latest is not None:
+            image, timestamp, generation = latest
+            frame = Frame(image, window[0], window[1], scale_size, generation, timestamp)
+            if region is None:
+                return frame
+            part = frame.crop(region)
+            if part is not None:
+                return part
+        else:
+            log.debug("Capture service: no frame available, taking a screenshot")
+
+    if region is None:
+        left, top = window[0], window[1]
+        img = partscreen(window[2], window[3], top, left)
+    else:
+        left, top = region[3], region[2]
+        img = partscreen(region[0], region[1], top, left)
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if not color:
+        return Frame(gray, left, top, scale_size, generation)
+    bgr = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    return Frame(gray, left, top, scale_size, generation, color=bgr)
+
+
+_capture_service = None
+CAPTURE_SERVICE_TIMEOUT = 1
+
+
+def start_capture_service(fps=None):
+    """
+    Starts capturing the game window in the background so the probes don't
+    have to wait for a screenshot.
+
+    Args:
+    fps (float): The number of screenshots per second. Defaults to the 'capture_fps' setting.
+        The capture service isn't started if it's 0.
+    """
+    global _capture_service
+    fps = settings_dict["capture_fps"] if fps is None else fps
+    if not fps or (_capture_service is not None and _capture_service.running):
+        return
+    _capture_service = CaptureService(fps)
+    _capture_service.start()
+
+
+def stop_capture_service():
+    """Stops the background capture (if running)."""
+    global _capture_service
+    if _capture_service is not None:
+        _capture_service.stop()
+        _capture_service = None
+
+
+class CaptureSession:
+    """
+    Context manager sharing one window Frame between all the probes done inside it.
+    The frame is captured again when it's older than 'ttl' seconds or after a mouse input.
+
+        with capture_session():
+            if find_element(A, Action.screenshot):  # screenshot taken here
+                ...
+            if find_element(B, Action.screenshot):  # same screenshot reused
+                ...
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = settings_dict["frame_ttl"] if ttl is None else ttl
+        self.frame = None
+        self.captures = 0
+        self.hits = 0
+        self._outer = None
+
+    def get_frame(self, region=None, newer_than=None):
+        """
+        Gets the shared frame (or a part of it), capturing a new one if needed.
+
+        Args:
+        region (list): [width, height, top, left] of the part of the screen to look at.
+            Defaults to None (the whole game window).
+        newer_than (float): Capture a new frame if the shared one was taken before
+            this monotonic time. Defaults to None.
+
+        Returns:
+        Frame: The frame to use for the next probe.
+        """
+        if (
+            self.frame is None
+            or self.frame.is_stale(self.ttl)
+            or (newer_than is not None and self.frame.timestamp <= newer_than)
+        ):
+            self.frame = capture_frame(newer_than=newer_than)
+            self.captures += 1
+        else:
+            self.hits += 1
+
+        if region is None:
+            return self.frame
+        return self.frame.crop(region) or capture_frame(region)
+
+    def invalidate(self):
+        """Forgets the shared frame so the next probe takes a new screenshot."""
+        self.frame = None
+
+    def __enter__(self):
+        global _session
+        self._outer = _session
+        _session = self
+        return self
+
+    def __exit__(self, *exc):
+        global _session
+        _session = self._outer
+        log.debug(
+            "Capture session: %s screenshot(s) for %s probe(s)",
+            self.captures,
+            self.captures + self.hits,
+        )
+        return False
+
+
+_session = None
+
+
+def capture_session(ttl=None):
+    """
+    Creates a context manager sharing one window Frame between several probes.
+
+    Args:
+    ttl (float): The maximum age (in seconds) of the shared frame.
+        Defaults to the 'frame_ttl' setting.
+
+    Returns:
+    CaptureSession: The capture session.
+    """
+    return CaptureSession(ttl)
+
+
+def get_frame(region=None, newer_than=None):
+    """
+    Gets the Frame used by the next probe: the frame of the current capture session
+    if there is one, a new screenshot otherwise.
+
+    Args:
+    region (list): [width, height, top, left] of the part of the screen to look at.
+        Defaults to None (the whole game window).
+    newer_than (float): Use a frame taken after this monotonic time. Defaults to None.
+
+    Returns:
+    Frame: The frame to use.
+    """
+    if _session is not None:
+        return _session.get_frame(region, newer_than)
+    return capture_frame(region, newer_than)
+
+
+def invalidate_frame():
+    """Forgets the frame of the current capture session (if any)."""
+    if _session is not None:
+        _session.invalidate()
 
 
 def find_element(file, action=Action.get_coords, threshold="-", new_screen=True):
@@ -165,17 +1034,263 @@ def find_element(file, action=Action.get_coords, threshold="-", new_screen=True)
         if action == Action.move:
             window = windowMP()
             move_mouse(window, x, y)
+            invalidate_frame()
             return True
         if action == Action.move_and_click:
             # move mouse and click
             window = windowMP()
             move_mouse_and_click(window, x, y)
+            invalidate_frame()
             return True
     if action in [Action.get_coords_part_screen, Action.get_coords]:
         return None
     return False
 
 
+class MatchResult(
+    namedtuple(
+        "MatchResult",
+        ["file", "coords", "score", "threshold", "bbox", "duration", "reused"],
+        defaults=[False],
+    )
+):
+    """
+    Result of the search of a template on a frame.
+    Attributes:
+    file: The template file (like "buttons/play.png").
+    coords: The (x, y) center of the element relative to the window, or None if not found.
+    score: The best matching score.
+    threshold: The threshold the score had to exceed.
+    bbox: The [x0, y0, x1, y1] box of the best match relative to the window (None if the template is missing).
+    duration: The time spent to match the template (in seconds).
+    reused: True if the result of the same search on an unchanged frame was reused.
+    """
+
+    @property
+    def found(self):
+        """True if the element was found."""
+        return self.coords is not None
+
+    def random_coords(self):
+        """
+        Returns a random point near the center of the element found.
+        """
+        min_axis = min(self.bbox[2] - self.bbox[0], self.bbox[3] - self.bbox[1]) // 2
+        range = int(min_axis // 4)
+        return (
+            self.coords[0] + random.randint(-range, range),
+            self.coords[1] + random.randint(-range, range),
+        )
+
+
+template_registry = None
+
+
+def get_template_registry():
+    """
+    Gets the template registry of the images resolution and locale (built on first use).
+
+    Returns:
+        TemplateRegistry: The template registry.
+    """
+    global template_registry
+    if template_registry is None:
+        template_registry = TemplateRegistry(
+            settings_dict["root_images_dir"],
+            get_images_resolution(),
+            settings_dict["locale"],
+            jthreshold,
+        )
+    return template_registry
+
+
+def load_template_registry():
+    """
+    Builds the template registry and checks that the images used by the bot exist
+    (every UI element and button, and the level to farm). To call once the images of
+    the setting resolution are generated.
+
+    Raises:
+        MissingTemplate: If some images are missing.
+    """
+    global template_registry
+    template_registry = None
+    registry = get_template_registry()
+    required = [
+        member.filename
+        for enum in (UIElement, Button)
+        for member in enum
+        if member.name != "_dir_name"
+    ]
+    if settings_dict["location"] and settings_dict["mode"]:
+        required.append(
+            f"levels/{settings_dict['location']}"
+            f"_{settings_dict['mode']}_{settings_dict['level']}.png"
+        )
+    registry.require(required)
+    log.info("%s images available for %s", len(registry), get_images_resolution())
+
+
+def get_threshold(file, threshold="-"):
+    """
+    Gets the matching threshold of a template.
+
+    Args:
+        file (str): The template file (like "buttons/play.png").
+        threshold (str or float): The threshold to use, or '-' for the threshold
+            set in thresholds.json (or the default one). Defaults to '-'.
+
+    Returns:
+        float: The threshold.
+    """
+    if threshold == "-":
+        template = get_template_registry().get(file)
+        if template is None:
+            return jthreshold["default_grey"]
+        return template.threshold
+    return threshold
+
+
+def get_template_path(file):
+    """
+    Gets the path of a template file for the setting resolution and locale.
+
+    Args:
+        file (str): The template file (like "buttons/play.png").
+
+    Returns:
+        str or None: The path of the template or None if it doesn't exist.
+    """
+    template = get_template_registry().get(file)
+    if template is None:
+        log.error(
+            f'Err: file "{file}" doesn\'t exist for {get_images_resolution()}.'
+        )
+        return None
+    return template.path
+
+
+def match_on_frame(frame, file, threshold="-", learn_roi=False, window=None):
+    """
+    Looks for a template on a frame.
+    The result is reused when the same template is looked for on an unchanged
+    part of the screen (see the 'reuse_matches' setting).
+
+    Args:
+        frame (Frame): The frame to look into.
+        file (str): The template file (like "buttons/play.png").
+        threshold (str or float): The threshold for template matching. Defaults to '-'.
+        learn_roi (bool): Whether to use and update the learned region of interest
+            of the template (for whole window frames only). Defaults to False.
+        window (tuple): The game window geometry. Defaults to None (windowMP()).
+
+    Returns:
+        MatchResult: The result of the search.
+    """
+    start = time.perf_counter()
+    threshold = get_threshold(file, threshold)
+    window = windowMP() if window is None else window
+
+    # same template on the same (unchanged) part of the screen: same result
+    memo_key = None
+    if settings_dict["reuse_matches"]:
+        memo_key = (file, threshold, frame.left, frame.top, frame.image.shape, window)
+        memo = match_on_frame.memo.lookup(memo_key)
+        if memo is not None and unchanged(memo[0], frame.fingerprint):
+            log.debug(f"Unchanged screen, reusing the result for {file}")
+            return memo[1]._replace(
+                duration=time.perf_counter() - start, reused=True
+            )
+
+    file_path = get_template_path(file)
+    if file_path is None:
+        return MatchResult(file, None, -1, threshold, None, 0)
+    template, mask = get_scaled_gray_image(file_path, (window[2], window[3]))
+
+    roi = None
+    learn_roi = learn_roi and settings_dict["learn_roi"]
+    if learn_roi:
+        frame_size = f"{frame.image.shape[1]}x{frame.image.shape[0]}"
+        roi = roi_index.get(frame_size, file)
+
+    rejected = False
+    if roi is not None and quick_reject(frame, file, file_path, roi, window):
+        rejects = signature_rejects.get((frame_size, file), 0) + 1
+        if rejects < SIGNATURE_RECHECK:
+            # not at its usual place: not found
+            signature_rejects[(frame_size, file)] = rejects
+            log.debug(f"Signature of {file} not found in {roi}")
+            rejected = True
+        else:
+            # the whole search finds the element if it moved, and learns its new place
+            del signature_rejects[(frame_size, file)]
+            log.debug(f"Signature of {file} not found {rejects} times, whole search")
+            roi = None
+
+    if rejected:
+        score, loc = 0, (roi[0], roi[1])
+    elif get_template_registry().get(file).engine == "chamfer":
+        log.debug(f"Looking for the edges of {file} with threshold {threshold}")
+        edges = get_edge_image(file_path, (window[2], window[3]))
+        score, loc = locate_edges(frame.get_distance_map(), edges, threshold, roi)
+    else:
+        # choose the matching engine: masked, pyramid, frequency domain or cv2.matchTemplate
+        options = {}
+        level = get_pyramid_level(file, template)
+        if mask is not None:
+            options["samples"] = get_sparse_samples(file_path, (window[2], window[3]))
+        elif level:
+            options["pyramid_level"] = level
+            options["small_template"] = get_pyramid_image(
+                file_path, (window[2], window[3]), level
+            )
+        elif use_fft(template, mask, frame.image):
+            # computed only if the template isn't found in its ROI
+            def fft_match():
+                spectrum = frame.get_spectrum()
+                template_spectrum = get_spectrum_image(
+                    file_path, (window[2], window[3]), spectrum.dft_size
+                )
+                return spectrum.match(template, template_spectrum)
+
+            options["fft_match"] = fft_match
+
+        log.debug(f"Looking for {file} with threshold {threshold}")
+        score, loc = locate(frame.image, template, mask, threshold, roi, **options)
+    log.debug(f"max_val: {round(score, 2)}, threshold: {threshold}")
+
+    th, tw = template.shape[:2]
+    if learn_roi and score > threshold:
+        roi_index.learn(frame_size, file, [loc[0], loc[1], loc[0] + tw, loc[1] + th])
+        signature_rejects.pop((frame_size, file), None)
+
+    # from frame pixels to window coordinates
+    left = frame.left - window[0]
+    top = frame.top - window[1]
+    x0 = loc[0] / frame.scale_size + left
+    y0 = loc[1] / frame.scale_size + top
+    bbox = [x0, y0, x0 + tw / frame.scale_size, y0 + th / frame.scale_size]
+    coords = None
+    if score > threshold:
+        coords = (
+            (loc[0] + tw // 2) / frame.scale_size + left,
+            (loc[1] + th // 2) / frame.scale_size + top,
+        )
+    result = MatchResult(
+        file, coords, score, threshold, bbox, time.perf_counter() - start
+    )
+    if memo_key is not None:
+        match_on_frame.memo.put(memo_key, (frame.fingerprint, result))
+    return result
+
+
+# the least recently used results are dropped (like the blob windows of the
+# previous battles, see find_elements_by_hue)
+match_on_frame.memo = ImageCache(
+    "Match results", MATCH_MEMO_BYTES, MATCH_MEMO_RESULTS
+)
+
+
 def find_element_from_file(
     file,
     new_screenshot=True,
@@ -187,7 +1302,9 @@ def find_element_from_file(
 
     Args:
         file (str): The file path of the template.
-        new_screenshot (bool): Whether to take a new screenshot for matching. Defaults to True.
+        new_screenshot (bool or list): True to look into the whole window, or
+            [width, height, top, left] to look into a part of the screen. Defaults to True.
+            The screenshot is shared with other probes inside a capture session.
         threshold (str): The threshold for template matching. Defaults to '-'.
         random_point (bool): Whether to return a random point near the center of the element. Defaults to True.
 
@@ -197,71 +1314,337 @@ def find_element_from_file(
         and will be a small range of random point near the center of the element if random_point is True.
     """
 
-    if threshold == "-":
-        if file in jthreshold and jthreshold[file] != "-":
-            threshold = jthreshold[file]
-        else:
-            threshold = jthreshold["default_grey"]
-
-    resolution, width, height, scale_size = get_resolution()
-
     # choose if the bot need to look into the window or in a part of the window
-    if new_screenshot is True:
-        top = 0
-        left = 0
-        find_element_from_file.partImg = partscreen(
-            windowMP()[2],
-            windowMP()[3],
-            windowMP()[1],
-            windowMP()[0],
-            resize_width=width,
-            resize_height=height,
-        )
-    else:
-        top = new_screenshot[2] - windowMP()[1]
-        left = new_screenshot[3] - windowMP()[0]
-        find_element_from_file.partImg = partscreen(
-            new_screenshot[0],
-            new_screenshot[1],
-            new_screenshot[2],
-            new_screenshot[3],
-            scale_size=scale_size,
-        )
+    frame = get_frame(None if new_screenshot is True else new_screenshot)
 
-    img = cv2.cvtColor(find_element_from_file.partImg, cv2.COLOR_BGR2GRAY)
-    file_path = f"files/{resolution}/{file}"
-    if settings_dict["locale"]:
-        i18n_file_path = f"files/i18n/{settings_dict['locale']}/{resolution}/{file}"
-        if os.path.isfile(i18n_file_path):
-            file_path = i18n_file_path
-    if not os.path.isfile(file_path):
-        log.error(f'Err: file "{file_path}" doesn\'t exist.')
+    # only whole window screenshots are used to learn where the templates are
+    result = match_on_frame(frame, file, threshold, learn_roi=new_screenshot is True)
+    if not result.found:
+        # log.info("Waiting for... %s\033[K" % file)
         return None
-    
-    template, mask = get_gray_image(file_path)
 
-    log.debug(f"Looking for {file} with threshold {threshold}")
-    click_coords = find_element_center_on_screen(img, template, mask, threshold, scale_size)
+    click_coords = list(result.coords)
+    log.info(
+        "Found %s ( %s ) %s %s",
+        file,
+        result.threshold,
+        click_coords[0],
+        click_coords[1],
+    )
+    if random_point:
+        click_coords = result.random_coords()
+        log.debug("Random point: %s %s", click_coords[0], click_coords[1])
 
-    if click_coords is not None:
-        click_coords = [click_coords[0] + left, click_coords[1] + top]
-        log.info(
-            "Found %s ( %s ) %s %s", file, threshold, click_coords[0], click_coords[1]
+    return click_coords
+
+
+_match_pool = None
+_match_pool_threads = 1
+_match_pool_lock = threading.Lock()
+
+
+def get_match_pool():
+    """
+    Gets the thread pool used to match several templates at the same time.
+    Its size is set by the 'match_workers' setting (0: one thread per CPU, 1: no pool).
+
+    Returns:
+        ThreadPoolExecutor or None: The pool, or None if templates are matched one by one.
+    """
+    global _match_pool, _match_pool_threads
+    if _match_pool is None:
+        cpus = os.cpu_count() or 1
+        workers = settings_dict["match_workers"] or cpus
+        if workers <= 1:
+            return None
+        _match_pool_threads = max(1, cpus // workers)
+        _match_pool = ThreadPoolExecutor(workers, thread_name_prefix="match")
+        log.debug(
+            "Matching pool: %s thread(s), OpenCV: %s thread(s) while in use",
+            workers,
+            _match_pool_threads,
         )
-        if random_point:
-            min_axis = min(template.shape[0], template.shape[1]) // 2
-            range = min_axis // 4
-            click_coords = (
-                click_coords[0] + random.randint(-range, range),
-                click_coords[1] + random.randint(-range, range),
+    return _match_pool
+
+
+def match_batch(match, files):
+    """
+    Matches several templates on the matching thread pool (see get_match_pool), or one
+    by one without pool. OpenCV's own threads are reduced for the time of the batch only,
+    so the pool and OpenCV don't use more threads than there are CPUs, while the single
+    searches keep all the OpenCV threads.
+
+    Args:
+        match (function): Called with each file, returning its MatchResult.
+        files (list): The template files.
+
+    Returns:
+        list: A MatchResult for every file, in the same order.
+    """
+    pool = get_match_pool() if len(files) > 1 else None
+    if pool is None:
+        return [match(file) for file in files]
+    with _match_pool_lock:
+        threads = cv2.getNumThreads()
+        cv2.setNumThreads(_match_pool_threads)
+        try:
+            # cv2.matchTemplate releases the GIL: templates are matched in parallel
+            return list(pool.map(match, files))
+        finally:
+            cv2.setNumThreads(threads)
+
+
+def find_elements(files, threshold="-", new_screen=True):
+    """
+    Finds several elements on the same screenshot: the screen is captured (and
+    converted to grayscale) once and every template is matched against it
+    (on the matching thread pool, see get_match_pool).
+
+    Args:
+        files (list): The template files (like "buttons/play.png").
+        threshold (str or float): The threshold for all the templates, or '-' to use
+            the threshold of each template. Defaults to '-'.
+        new_screen (bool or list): True to look into the whole window, or
+            [width, height, top, left] to look into a part of the screen. Defaults to True.
+
+    Returns:
+        list: A MatchResult for every file, in the same order.
+    """
+    start = time.perf_counter()
+    frame = get_frame(None if new_screen is True else new_screen)
+    window = windowMP()
+
+    def match(file):
+        return match_on_frame(frame, file, threshold, new_screen is True, window)
+
+    results = match_batch(match, files)
+    for result in results:
+        if result.found:
+            log.info(
+                "Found %s ( %s ) %s %s",
+                result.file,
+                result.threshold,
+                result.coords[0],
+                result.coords[1],
             )
-            log.debug("Random point: %s %s", click_coords[0], click_coords[1])
+    log.debug(
+        "Looked for %s element(s) in %.3fs", len(files), time.perf_counter() - start
+    )
+    return results
 
-    # else:
-    #     log.info("Waiting for... %s\033[K" % file)
-        # log.debug("Looked for %s ( %s )", file, threshold)
 
-    return click_coords
+def wait_for(any_of, timeout, interval=WAIT_MAX_INTERVAL, region=None, threshold="-"):
+    """
+    Waits for one of several elements to appear on the screen: every template is
+    matched against each new frame (once per file: Button.take and Button.keep are
+    the same image) until one is found or the time is out. A new frame is looked at
+    WAIT_MIN_INTERVAL seconds after the screen changed, then less and less often
+    (up to 'interval' seconds) while it doesn't change (see Frame.fingerprint).
+
+        result = wait_for([Button.take, Button.keep, Button.replace], 3)
+        if result is not None:
+            move_mouse_and_click(windowMP(), *result.random_coords())
+
+    Args:
+        any_of (list): The elements (like Button.take) or the template files.
+        timeout (float): The maximum time to wait (in seconds).
+        interval (float): The maximum time between two frames (in seconds).
+            Defaults to WAIT_MAX_INTERVAL.
+        region (list): [width, height, top, left] of the part of the screen to look into.
+            Defaults to None (the whole window).
+        threshold (str or float): The threshold for all the templates, or '-' to use
+            the threshold of each template. Defaults to '-'.
+
+    Returns:
+        MatchResult or None: The result of the first element seen (in the order of
+        'any_of' for the elements of the same frame), or None if none appeared.
+    """
+    files = list(
+        dict.fromkeys(getattr(element, "filename", element) for element in any_of)
+    )
+    start = time.monotonic()
+    min_interval = min(WAIT_MIN_INTERVAL, interval)
+    delay = min_interval
+    previous = None
+    frames = 0
+
+    while True:
+        # a frame taken after the previous one (or after the call)
+        frame = get_frame(region, start if previous is None else previous.timestamp)
+        window = windowMP()
+        frames += 1
+
+        def match(file):
+            return match_on_frame(frame, file, threshold, region is None, window)
+
+        for result in match_batch(match, files):
+            if result.found:
+                log.info(
+                    "Found %s ( %s ) %s %s after %.1fs (%s frame(s))",
+                    result.file,
+                    result.threshold,
+                    result.coords[0],
+                    result.coords[1],
+                    time.monotonic() - start,
+                    frames,
+                )
+                return result
+
+        remaining = start + timeout - time.monotonic()
+        if remaining <= 0:
+            log.debug("None of %s after %ss (%s frame(s))", files, timeout, frames)
+            return None
+        if previous is not None and unchanged(previous.fingerprint, frame.fingerprint):
+            delay = min(delay * 2, interval)
+        else:
+            delay = min_interval
+        previous = frame
+        time.sleep(min(delay, remaining))
+
+
+def match_all_on_frame(frame, file, threshold="-", window=None):
+    """
+    Looks for all the occurrences of a template on a frame (see matching.match_all).
+
+    Args:
+        frame (Frame): The frame to look into.
+        file (str): The template file (like "UI_elements/reward_chest.png").
+        threshold (str or float): The threshold for template matching. Defaults to '-'.
+        window (tuple): The game window geometry. Defaults to None (windowMP()).
+
+    Returns:
+        numpy.ndarray: (N, 3) array of [x, y, score], the center of each occurrence
+        relative to the window, sorted by decreasing score.
+    """
+    threshold = get_threshold(file, threshold)
+    window = windowMP() if window is None else window
+
+    file_path = get_template_path(file)
+    if file_path is None:
+        return np.empty((0, 3))
+    template, mask = get_scaled_gray_image(file_path, (window[2], window[3]))
+    if (
+        frame.image.shape[0] < template.shape[0]
+        or frame.image.shape[1] < template.shape[1]
+    ):
+        return np.empty((0, 3))
+
+    hits = match_all(frame.image, template, mask, threshold)
+    # from frame pixels to window coordinates (centers)
+    th, tw = template.shape[:2]
+    hits[:, 0] = (hits[:, 0] + tw // 2) / frame.scale_size + frame.left - window[0]
+    hits[:, 1] = (hits[:, 1] + th // 2) / frame.scale_size + frame.top - window[1]
+    return hits
+
+
+def find_all_elements(file, threshold="-", new_screen=True):
+    """
+    Finds all the occurrences of an element with a single search.
+
+    Args:
+        file (str): The template file (like "UI_elements/reward_chest.png").
+        threshold (str or float): The threshold for template matching. Defaults to '-'.
+        new_screen (bool or list): True to look into the whole window, or
+            [width, height, top, left] to look into a part of the screen. Defaults to True.
+
+    Returns:
+        numpy.ndarray: (N, 3) array of [x, y, score], the center of each occurrence
+        relative to the window, sorted by decreasing score.
+    """
+    start = time.perf_counter()
+    frame = get_frame(None if new_screen is True else new_screen)
+    hits = match_all_on_frame(frame, file, threshold)
+    log.debug(
+        "Found %s occurrence(s) of %s in %.3fs",
+        len(hits),
+        file,
+        time.perf_counter() - start,
+    )
+    return hits
+
+
+def find_elements_by_hue(files, region=None, threshold="-"):
+    """
+    Finds several colored elements (like the role badges of the enemies) on the same
+    screenshot: the groups of colored pixels of the screenshot are found once (see
+    matching.color_blobs), then every template is only matched around the blobs having
+    its hues. Templates without characteristic hue (mostly gray) are matched on the
+    whole screenshot, like find_elements.
+
+    Args:
+        files (list): The template files (like "UI_elements/red.png").
+        region (list): [width, height, top, left] of the part of the screen to look into.
+            Defaults to None (the whole window).
+        threshold (str or float): The threshold for all the templates, or '-' to use
+            the threshold of each template. Defaults to '-'.
+
+    Returns:
+        list: A MatchResult for every file, in the same order.
+    """
+    start = time.perf_counter()
+    frame = capture_frame(region, color=True)
+    window = windowMP()
+    size = (window[2], window[3])
+    blobs = color_blobs(frame.hsv)
+
+    results = []
+    for file in files:
+        file_path = get_template_path(file)
+        hue = None if file_path is None else get_hue_histogram(file_path, size)
+        if hue is None:
+            results.append(match_on_frame(frame, file, threshold, window=window))
+            continue
+
+        histogram, count = hue
+        template, _ = get_scaled_gray_image(file_path, size)
+        windows = hue_candidates(
+            frame.hsv, blobs, histogram, template.shape, HUE_MIN_RATIO * count
+        )
+        if len(windows) > HUE_MAX_CANDIDATES:
+            log.debug(f"{len(windows)} blobs of the hues of {file}, whole search")
+            results.append(match_on_frame(frame, file, threshold, window=window))
+            continue
+
+        # template confirmation around the blobs only
+        best = None
+        for x0, y0, x1, y1 in windows:
+            part = frame.crop(
+                [
+                    (x1 - x0) / frame.scale_size,
+                    (y1 - y0) / frame.scale_size,
+                    frame.top + y0 / frame.scale_size,
+                    frame.left + x0 / frame.scale_size,
+                ]
+            )
+            if part is None or part.image.shape[0] < template.shape[0]:
+                continue
+            if part.image.shape[1] < template.shape[1]:
+                continue
+            result = match_on_frame(part, file, threshold, window=window)
+            if best is None or result.score > best.score:
+                best = result
+        if best is None:
+            log.debug(f"No blob of the hues of {file}")
+            best = MatchResult(
+                file, None, 0, get_threshold(file, threshold), None, 0
+            )
+        results.append(best)
+
+    for result in results:
+        if result.found:
+            log.info(
+                "Found %s ( %s ) %s %s",
+                result.file,
+                result.threshold,
+                result.coords[0],
+                result.coords[1],
+            )
+    log.debug(
+        "Looked for %s colored element(s) in %.3fs",
+        len(files),
+        time.perf_counter() - start,
+    )
+    return results
 
 
 def partscreen(
@@ -318,7 +1701,9 @@ def partscreen(
     return partImg
 
 
-def find_element_center_on_screen(img, template, mask, threshold=0, scale_size=1):
+def find_element_center_on_screen(
+    img, template, mask, threshold=0, scale_size=1, roi=None
+):
     """
     Finds the center of an element on the screen.
 
@@ -327,15 +1712,16 @@ def find_element_center_on_screen(img, template, mask, threshold=0, scale_size=1
     template (numpy.ndarray): The image of the element to find.
     threshold (float): The threshold for template matching. Defaults to 0.
     scale_size (float): The scaling factor for resizing. Defaults to 1.
+    roi (list): [x0, y0, x1, y1] area of 'img' to look into first; the whole image
+        is searched only if the element isn't found there. Defaults to None.
 
     Returns:
     tuple or None: The coordinates of the center of the element found or None if not found.
     """
 
-    result = cv2.matchTemplate(img, template, cv2.TM_CCOEFF_NORMED, mask=mask)
     h = template.shape[0] // 2
     w = template.shape[1] // 2
-    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    max_val, max_loc = locate(img, template, mask, threshold, roi)
     log.debug(f"max_val: {round(max_val, 2)}, threshold: {threshold}")
     return (
         ((max_loc[0] + w) / scale_size, (max_loc[1] + h) / scale_size)
@@ -343,6 +1729,137 @@ def find_element_center_on_screen(img, template, mask, threshold=0, scale_size=1
         else None
     )
 
+
+def locate(
+    img,
+    template,
+    mask,
+    threshold,
+    roi=None,
+    pyramid_level=0,
+    small_template=None,
+    fft_match=None,
+    samples=None,
+):
+    """
+    Finds the best match of a template in an image, looking into the region of
+    interest first and into the whole image only if the score isn't above 'threshold'.
+
+    Args:
+    img (numpy.ndarray): The image to look into.
+    template (numpy.ndarray): The image to find.
+    mask (numpy.ndarray): The mask of the template (or None).
+    threshold (float): The score to exceed.
+    roi (list): [x0, y0, x1, y1] area of 'img' to look into first. Defaults to None.
+    pyramid_level (int): Use a coarse-to-fine search at this level (0: no pyramid). Defaults to 0.
+    small_template (numpy.ndarray): The template downscaled to 'pyramid_level'. Defaults to None.
+    fft_match (function): Matches the template in the whole image in the frequency
+        domain (see FrameSpectrum). Defaults to None.
+    samples (tuple): The pixels of the masked template compared first (see
+        matching.sparse_samples). Defaults to None.
+
+    Returns:
+    tuple: (max_val, max_loc) the best score and the top left corner of the match in 'img'.
+    """
+    options = {
+        "pyramid_level": pyramid_level,
+        "min_score": threshold - PYRAMID_SLACK,
+        "small_template": small_template,
+        "samples": samples,
+    }
+    if roi is not None:
+        max_val, max_loc = best_match(img, template, mask, roi, **options)
+        if max_val > threshold:
+            return max_val, max_loc
+        log.debug(f"Not found in ROI {roi} (max_val: {round(max_val, 2)})")
+    if fft_match is not None:
+        return fft_match()
+    return best_match(img, template, mask, **options)
+
+
+def locate_edges(distance_map, edges, threshold, roi=None):
+    """
+    Finds the best match of the edges of a template (see matching.DistanceMap),
+    looking into the region of interest first and into the whole frame only if
+    the score isn't above 'threshold'.
+
+    Args:
+    distance_map (DistanceMap): The distance transform of the frame.
+    edges (tuple): The edges of the template (see get_edge_image).
+    threshold (float): The score to exceed.
+    roi (list): [x0, y0, x1, y1] area of the frame to look into first. Defaults to None.
+
+    Returns:
+    tuple: (max_val, max_loc) the best score and the top left corner of the match.
+    """
+    if roi is not None:
+        height, width = distance_map.distance.shape
+        margin = ROI_MARGIN * width // 1920
+        area = [
+            max(0, roi[0] - margin),
+            max(0, roi[1] - margin),
+            min(width, roi[2] + margin),
+            min(height, roi[3] + margin),
+        ]
+        max_val, max_loc = distance_map.match(*edges, area)
+        if max_val > threshold:
+            return max_val, max_loc
+        log.debug(f"Not found in ROI {roi} (max_val: {round(max_val, 2)})")
+    return distance_map.match(*edges)
+
+
+def best_match(
+    img,
+    template,
+    mask=None,
+    roi=None,
+    pyramid_level=0,
+    min_score=0,
+    small_template=None,
+    samples=None,
+):
+    """
+    Finds the best match of a template in an image (or in a part of it).
+    Masked templates are matched on a few pixels first (see matching.match_masked).
+
+    Args:
+    img (numpy.ndarray): The image to look into.
+    template (numpy.ndarray): The image to find.
+    mask (numpy.ndarray): The mask of the template. Defaults to None.
+    roi (list): [x0, y0, x1, y1] area of 'img' to look into, extended by
+        ROI_MARGIN. Defaults to None (the whole image).
+    pyramid_level (int): Use a coarse-to-fine search at this level (0: no pyramid). Defaults to 0.
+    min_score (float): Coarse peaks under this score aren't refined. Defaults to 0.
+    small_template (numpy.ndarray): The template downscaled to 'pyramid_level'. Defaults to None.
+    samples (tuple): The pixels of the masked template compared first. Defaults to None.
+
+    Returns:
+    tuple: (max_val, max_loc) the best score and the top left corner of the match in 'img'.
+    """
+    x0 = y0 = 0
+    if roi is not None:
+        margin = ROI_MARGIN * img.shape[1] // 1920
+        x0 = max(0, roi[0] - margin)
+        y0 = max(0, roi[1] - margin)
+        x1 = min(img.shape[1], max(roi[2] + margin, x0 + template.shape[1]))
+        y1 = min(img.shape[0], max(roi[3] + margin, y0 + template.shape[0]))
+        if x1 - x0 < template.shape[1] or y1 - y0 < template.shape[0]:
+            return -1, (0, 0)
+        img = img[y0:y1, x0:x1]
+    elif img.shape[0] < template.shape[0] or img.shape[1] < template.shape[1]:
+        return -1, (0, 0)
+
+    if mask is not None:
+        max_val, max_loc = match_masked(img, template, mask, samples)
+    elif pyramid_level:
+        max_val, max_loc = match_pyramid(
+            img, template, mask, pyramid_level, min_score, small_template
+        )
+    else:
+        max_val, max_loc = match_full(img, template, mask)
+    return max_val, (max_loc[0] + x0, max_loc[1] + y0)
+
+
 def save_screenshot(file_full_path):
     """
     Saves a screenshot to a file.
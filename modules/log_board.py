@@ -53,6 +53,7 @@ class LogHSMercs:
     def _initialize_logfile(self):
         self.filePos = None
         self.eof = False
+        self.caught_up = threading.Event()
         self.line = None
         self.logfile = open(self.logpath, "r", encoding="UTF-8")
 
@@ -104,9 +105,12 @@ class LogHSMercs:
             line = self.logfile.readline()
             # Sleep if the file hasn't been updated
             if not line:
-                self.eof = True
+                if not self.eof:
+                    self.eof = True
+                    self.caught_up.set()
                 rsleep(0.1)
                 continue
+            self.eof = False
 
             if "ZoneChangeList.ProcessChanges() - processing" in line:
                 if re.search(zone_change_pattern1, line):
@@ -169,6 +173,18 @@ class LogHSMercs:
             # elif "ZoneMgr.AutoCorrectZonesAfterServerChange()" in line:
             #     self.zonechange_finished = True
 
+    def wait_eof(self, timeout=None):
+        """
+        Waits until the end of the log file is reached once.
+
+        Args:
+            timeout (float): The maximum time to wait (in seconds). Defaults to None (no limit).
+
+        Returns:
+            bool: True if the end of the file was reached.
+        """
+        return self.caught_up.wait(timeout)
+
     def get_zonechanged(self):
         """
         Checks if a zone change has been completed in the log file.
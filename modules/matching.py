@@ -0,0 +1,728 @@
+"""
+This module provides the template matching engines used by image_utils.
+They work on grayscale numpy images and don't depend on the game window or settings.
+
+Functions:
+- match_full: Find the best match of a template with cv2.matchTemplate.
+- match_pyramid: Find the best match of a template with a coarse-to-fine search.
+- match_all: Find all the matches of a template with non-maximum suppression.
+- sparse_samples: Pick the pixels of a masked template used by match_masked.
+- match_masked: Find the best match of a masked template, on a few pixels first.
+- signature_difference: Compare a few pixels of a template with an image at a position.
+- fingerprint: Compute a small thumbnail of an image to detect changes.
+- unchanged: Compare two fingerprints.
+- colored_pixels: Get the mask of the pixels having a hue.
+- hue_histogram: Compute the hue/saturation histogram of the colored pixels of an image.
+- color_blobs: Find the groups of colored pixels of an image.
+- hue_candidates: Find the color blobs of an image matching a hue histogram.
+- edge_map: Compute the edges of an image.
+- edge_kernel: Compute the edge points of a template compared by DistanceMap.
+- edge_distance: Compute the distance transform of the edges of a template.
+
+Classes:
+- FrameSpectrum: Frequency domain correlation sharing the spectrum of a frame between templates.
+- DistanceMap: Chamfer matching sharing the distance transform of a frame between templates.
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# version of the data derived from the templates (see derived_cache):
+# to increase when the way they're computed changes
+ENGINE_VERSION = 1
+# number of coarse peaks refined at full resolution by match_pyramid
+PYRAMID_CANDIDATES = 3
+# pixels of a masked template compared at every position by match_masked
+SPARSE_SAMPLES = 32
+# positions matched with the whole mask by match_masked
+SPARSE_CANDIDATES = 5
+# positions differing more than this (mean gray level difference on the samples) are rejected
+SPARSE_MAX_DIFF = 48
+# two matches overlapping more than this (intersection over union) are the same element
+NMS_OVERLAP = 0.3
+# a fingerprint pixel is the mean of FINGERPRINT_CELL x FINGERPRINT_CELL pixels
+FINGERPRINT_CELL = 8
+# maximum difference (in gray levels) between two fingerprint pixels of the same screen
+FINGERPRINT_TOLERANCE = 3
+# pixels less saturated (or darker) than this are gray for the color prefilter
+HUE_MIN_SATURATION = 80
+HUE_MIN_VALUE = 60
+# hue/saturation bins of the histograms of the color prefilter
+HUE_BINS = (18, 4)
+# pixels whose back projection is lower than this don't have the hue of the template
+HUE_MIN_PROBABILITY = 32
+# thresholds of the Canny edge detector of the chamfer matching
+CHAMFER_CANNY = (50, 150)
+# distance (in pixels) from which a template edge has no frame edge at all
+CHAMFER_MAX_DISTANCE = 8
+# edge points of a template compared by DistanceMap
+CHAMFER_POINTS = 400
+# windows with this many times more edges than the template are clutter (score 0)
+CHAMFER_MAX_CLUTTER = 2
+# best positions of the edge points of a template checked the other way round
+CHAMFER_PEAKS = 5
+
+
+def match_full(img, template, mask=None):
+    """
+    Finds the best match of a template in an image with cv2.matchTemplate.
+
+    Args:
+        img (numpy.ndarray): The image to look into.
+        template (numpy.ndarray): The image to find.
+        mask (numpy.ndarray): The mask of the template. Defaults to None.
+
+    Returns:
+        tuple: (max_val, max_loc) the best score and the top left corner of the match.
+    """
+    result = cv2.matchTemplate(img, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    return max_val, max_loc
+
+
+def downscale(img, level):
+    """
+    Divides the size of an image by 2**level.
+
+    Args:
+        img (numpy.ndarray): The image.
+        level (int): The pyramid level.
+
+    Returns:
+        numpy.ndarray: The downscaled image.
+    """
+    factor = 2**level
+    size = (max(1, img.shape[1] // factor), max(1, img.shape[0] // factor))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def match_all(img, template, mask=None, threshold=0.8, overlap=NMS_OVERLAP):
+    """
+    Finds all the matches of a template in an image from a single correlation map:
+    the local maxima above the threshold, without the ones overlapping a better match
+    (non-maximum suppression).
+
+    Args:
+        img (numpy.ndarray): The image to look into.
+        template (numpy.ndarray): The image to find.
+        mask (numpy.ndarray): The mask of the template. Defaults to None.
+        threshold (float): The minimum score of a match. Defaults to 0.8.
+        overlap (float): The maximum intersection over union of two matches.
+            Defaults to NMS_OVERLAP.
+
+    Returns:
+        numpy.ndarray: (N, 3) array of [x, y, score] (top left corner of each match),
+        sorted by decreasing score.
+    """
+    th, tw = template.shape[:2]
+    result = cv2.matchTemplate(img, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+    np.nan_to_num(result, copy=False, nan=0, posinf=0, neginf=0)
+
+    # candidates: local maxima above the threshold, best first
+    peaks = (result >= threshold) & (result == cv2.dilate(result, None))
+    ys, xs = np.nonzero(peaks)
+    scores = result[ys, xs]
+    order = np.argsort(-scores, kind="stable")
+    xs, ys, scores = xs[order], ys[order], scores[order]
+
+    # all the boxes have the template size: the intersection only depends on the offsets
+    area = th * tw
+    keep = []
+    for i in range(len(scores)):
+        if keep:
+            inter_w = np.maximum(0, tw - np.abs(xs[keep] - xs[i]))
+            inter_h = np.maximum(0, th - np.abs(ys[keep] - ys[i]))
+            inter = inter_w * inter_h
+            if (inter / (2 * area - inter) > overlap).any():
+                continue
+        keep.append(i)
+
+    return np.column_stack((xs[keep], ys[keep], scores[keep])).astype(np.float64)
+
+
+def sparse_samples(template, mask, count=SPARSE_SAMPLES):
+    """
+    Picks the most discriminative pixels of a masked template: the template is split
+    into a grid of about 'count' cells and, in each cell, the visible pixel (mask > 0)
+    the farthest from the mean of the template is kept.
+
+    Args:
+        template (numpy.ndarray): The template.
+        mask (numpy.ndarray): The mask of the template.
+        count (int): The number of pixels to pick. Defaults to SPARSE_SAMPLES.
+
+    Returns:
+        tuple: (ys, xs, values) arrays of the positions and gray levels of the pixels.
+    """
+    th, tw = template.shape[:2]
+    visible = mask > 0
+    if not visible.any():
+        return np.empty(0, int), np.empty(0, int), np.empty(0, np.uint8)
+    deviation = np.abs(template.astype(np.int16) - int(template[visible].mean()))
+    deviation[~visible] = -1
+
+    side = max(1, int(np.sqrt(th * tw / count)))
+    ys, xs = [], []
+    for y0 in range(0, th, side):
+        for x0 in range(0, tw, side):
+            cell = deviation[y0 : y0 + side, x0 : x0 + side]
+            y, x = np.unravel_index(np.argmax(cell), cell.shape)
+            if cell[y, x] >= 0:
+                ys.append(y0 + y)
+                xs.append(x0 + x)
+    ys, xs = np.array(ys), np.array(xs)
+    return ys, xs, template[ys, xs]
+
+
+def match_masked(img, template, mask, samples=None):
+    """
+    Finds the best match of a masked template: the mean difference between the image and
+    a few pixels of the template (see sparse_samples) is computed at every position, then
+    the template is matched with its mask (cv2.TM_CCOEFF_NORMED) around the positions
+    with the smallest differences only.
+
+    Args:
+        img (numpy.ndarray): The image to look into.
+        template (numpy.ndarray): The image to find.
+        mask (numpy.ndarray): The mask of the template.
+        samples (tuple): The result of sparse_samples for this template.
+            Defaults to None (computed here).
+
+    Returns:
+        tuple: (max_val, max_loc) the best score and the top left corner of the match.
+    """
+    th, tw = template.shape[:2]
+    if samples is None:
+        samples = sparse_samples(template, mask)
+    ys, xs, values = samples
+    if not len(values):
+        return match_full(img, template, mask)
+
+    # sum of the differences on the samples, for every position
+    height, width = img.shape[0] - th + 1, img.shape[1] - tw + 1
+    diff = np.zeros((height, width), np.uint16)
+    for y, x, value in zip(ys, xs, values):
+        cv2.add(
+            diff,
+            cv2.absdiff(img[y : y + height, x : x + width], int(value)),
+            dst=diff,
+            dtype=cv2.CV_16U,
+        )
+    diff = diff.astype(np.float32)
+
+    best_val, best_loc = -1, (0, 0)
+    pad = 2
+    for i in range(SPARSE_CANDIDATES):
+        min_diff, _, (cx, cy), _ = cv2.minMaxLoc(diff)
+        # the best candidate is always checked
+        if i and min_diff > SPARSE_MAX_DIFF * len(values):
+            break
+        x0, y0 = max(0, cx - pad), max(0, cy - pad)
+        x1 = min(img.shape[1], cx + tw + pad)
+        y1 = min(img.shape[0], cy + th + pad)
+        val, loc = match_full(img[y0:y1, x0:x1], template, mask)
+        if np.isfinite(val) and val > best_val:
+            best_val, best_loc = val, (loc[0] + x0, loc[1] + y0)
+        # suppress this candidate to get the next one
+        diff[
+            max(0, cy - th // 2) : cy + th // 2 + 1,
+            max(0, cx - tw // 2) : cx + tw // 2 + 1,
+        ] = np.inf
+
+    return best_val, best_loc
+
+
+def signature_difference(img, loc, samples):
+    """
+    Compares a few pixels of a template (see sparse_samples) with an image,
+    the template being at 'loc'.
+
+    Args:
+        img (numpy.ndarray): The image.
+        loc (tuple): The (x, y) position of the top left corner of the template.
+        samples (tuple): (ys, xs, values) of the pixels of the template.
+
+    Returns:
+        float or None: The mean gray level difference, or None if the pixels
+        are out of the image.
+    """
+    ys, xs, values = samples
+    if not len(values):
+        return None
+    ys = ys + loc[1]
+    xs = xs + loc[0]
+    if ys.max() >= img.shape[0] or xs.max() >= img.shape[1]:
+        return None
+    return float(np.abs(img[ys, xs].astype(np.int16) - values).mean())
+
+
+def fingerprint(img):
+    """
+    Computes a fingerprint of an image: its thumbnail, each pixel being the mean
+    of a FINGERPRINT_CELL x FINGERPRINT_CELL cell.
+
+    Args:
+        img (numpy.ndarray): The grayscale image.
+
+    Returns:
+        numpy.ndarray: The fingerprint (int16, to subtract fingerprints).
+    """
+    height, width = img.shape[:2]
+    size = (
+        max(1, -(-width // FINGERPRINT_CELL)),
+        max(1, -(-height // FINGERPRINT_CELL)),
+    )
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def unchanged(fingerprint1, fingerprint2):
+    """
+    Checks if two fingerprints are of the same (unchanged) image.
+
+    Args:
+        fingerprint1 (numpy.ndarray): The first fingerprint.
+        fingerprint2 (numpy.ndarray): The second fingerprint.
+
+    Returns:
+        bool: True if no cell differs by more than FINGERPRINT_TOLERANCE.
+    """
+    if fingerprint1.shape != fingerprint2.shape:
+        return False
+    return int(np.abs(fingerprint1 - fingerprint2).max()) <= FINGERPRINT_TOLERANCE
+
+
+def colored_pixels(hsv):
+    """Returns the mask of the pixels saturated (and bright) enough to have a hue."""
+    return cv2.inRange(
+        hsv, (0, HUE_MIN_SATURATION, HUE_MIN_VALUE), (180, 255, 255)
+    )
+
+
+def hue_histogram(hsv):
+    """
+    Computes the hue/saturation histogram of the colored pixels of an image.
+
+    Args:
+        hsv (numpy.ndarray): The image, in the HSV color space.
+
+    Returns:
+        tuple: (histogram, count) the histogram (scaled to 0-255, for cv2.calcBackProject)
+        and the number of colored pixels.
+    """
+    mask = colored_pixels(hsv)
+    histogram = cv2.calcHist([hsv], [0, 1], mask, HUE_BINS, [0, 180, 0, 256])
+    cv2.normalize(histogram, histogram, 0, 255, cv2.NORM_MINMAX)
+    return histogram, cv2.countNonZero(mask)
+
+
+def color_blobs(hsv, gap=3):
+    """
+    Finds the groups of colored pixels of an image, pixels closer than 'gap'
+    being in the same group.
+
+    Args:
+        hsv (numpy.ndarray): The image, in the HSV color space.
+        gap (int): The distance (in pixels) bridged between two colored pixels. Defaults to 3.
+
+    Returns:
+        tuple: (labels, stats) the label of every pixel (0: no blob) and the
+        statistics of the blobs (see cv2.connectedComponentsWithStats).
+    """
+    mask = colored_pixels(hsv)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (gap, gap))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    return labels, stats
+
+
+def hue_candidates(hsv, blobs, histogram, template_shape, min_pixels):
+    """
+    Finds the color blobs of an image having enough pixels of the hues of a
+    template, and the windows where the template may be around them.
+
+    Args:
+        hsv (numpy.ndarray): The image, in the HSV color space.
+        blobs (tuple): (labels, stats) the blobs of the image (see color_blobs).
+        histogram (numpy.ndarray): The histogram of the template (see hue_histogram).
+        template_shape (tuple): The (height, width) of the template.
+        min_pixels (int): The minimum number of pixels of the hues of the template.
+
+    Returns:
+        list: The [x0, y0, x1, y1] windows of the image to look into, from
+        the blob with the most pixels of the hues of the template.
+    """
+    labels, stats = blobs
+    back = cv2.calcBackProject([hsv], [0, 1], histogram, [0, 180, 0, 256], 1)
+    # pixels of the hues of the template, by blob
+    counts = np.bincount(
+        labels[back >= HUE_MIN_PROBABILITY], minlength=len(stats)
+    )
+    counts[0] = 0
+
+    th, tw = template_shape[:2]
+    height, width = hsv.shape[:2]
+    windows = []
+    for label in np.argsort(counts)[::-1]:
+        if counts[label] < min_pixels:
+            break
+        x, y, w, h = (int(value) for value in stats[label, :4])
+        windows.append(
+            [
+                max(0, x - tw),
+                max(0, y - th),
+                min(width, x + w + tw),
+                min(height, y + h + th),
+            ]
+        )
+    return windows
+
+
+def match_pyramid(
+    img, template, mask=None, level=1, min_score=0, small_template=None
+):
+    """
+    Finds the best match of a template with a coarse-to-fine search: the template
+    is first matched on the image downscaled 2**level times, then the best coarse
+    peaks are refined at full resolution in a small window around them.
+
+    Args:
+        img (numpy.ndarray): The image to look into.
+        template (numpy.ndarray): The image to find.
+        mask (numpy.ndarray): The mask of the template. Defaults to None.
+        level (int): The pyramid level (1: half size, 2: quarter size). Defaults to 1.
+        min_score (float): Coarse peaks under this score aren't refined. Defaults to 0.
+        small_template (numpy.ndarray): The template already downscaled to 'level'.
+            Defaults to None (downscaled here).
+
+    Returns:
+        tuple: (max_val, max_loc) the best score and the top left corner of the match.
+    """
+    factor = 2**level
+    th, tw = template.shape[:2]
+    small_img = downscale(img, level)
+    if small_template is None:
+        small_template = downscale(template, level)
+    small_mask = None if mask is None else downscale(mask, level)
+    sh, sw = small_template.shape[:2]
+    if small_img.shape[0] < sh or small_img.shape[1] < sw:
+        return match_full(img, template, mask)
+
+    coarse = cv2.matchTemplate(
+        small_img, small_template, cv2.TM_CCOEFF_NORMED, mask=small_mask
+    )
+
+    best_val, best_loc = -1, (0, 0)
+    pad = factor * 2
+    for _ in range(PYRAMID_CANDIDATES):
+        _, coarse_val, _, (cx, cy) = cv2.minMaxLoc(coarse)
+        if coarse_val < min_score:
+            # no candidate worth refining: the coarse score is the answer
+            if coarse_val > best_val:
+                best_val, best_loc = coarse_val, (cx * factor, cy * factor)
+            break
+
+        # refine around the peak at full resolution
+        x0 = max(0, cx * factor - pad)
+        y0 = max(0, cy * factor - pad)
+        x1 = min(img.shape[1], cx * factor + tw + pad)
+        y1 = min(img.shape[0], cy * factor + th + pad)
+        if x1 - x0 >= tw and y1 - y0 >= th:
+            val, loc = match_full(img[y0:y1, x0:x1], template, mask)
+            if val > best_val:
+                best_val, best_loc = val, (loc[0] + x0, loc[1] + y0)
+
+        # suppress this peak to get the next one
+        coarse[
+            max(0, cy - sh // 2) : cy + sh // 2 + 1,
+            max(0, cx - sw // 2) : cx + sw // 2 + 1,
+        ] = -1
+
+    return best_val, best_loc
+
+
+class FrameSpectrum:
+    """
+    Computes the same scores as cv2.TM_CCOEFF_NORMED in the frequency domain.
+
+    The spectrum and the integral images of the frame are computed once and shared
+    by every template matched against this frame, so each (big) template only costs
+    one inverse DFT. The spectrum of a template depends on the frame size only
+    (see get_template_spectrum) and can be kept between frames.
+    """
+
+    def __init__(self, img):
+        """
+        Args:
+            img (numpy.ndarray): The grayscale frame.
+        """
+        height, width = img.shape[:2]
+        self.shape = (height, width)
+        self.dft_size = dft_size(self.shape)
+        padded = np.zeros(self.dft_size, np.float32)
+        padded[:height, :width] = img
+        self.spectrum = cv2.dft(padded)
+        self.sum, self.sqsum = cv2.integral2(
+            img, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F
+        )
+        self._deviations = {}
+
+    def match(self, template, template_spectrum=None):
+        """
+        Finds the best match of a template in the frame.
+
+        Args:
+            template (numpy.ndarray): The image to find.
+            template_spectrum (tuple): The result of get_template_spectrum() for this
+                template and this frame size. Defaults to None (computed here).
+
+        Returns:
+            tuple: (max_val, max_loc) the best score and the top left corner of the match.
+        """
+        height, width = self.shape
+        th, tw = template.shape[:2]
+        if template_spectrum is None:
+            template_spectrum = get_template_spectrum(template, self.dft_size)
+        spectrum, energy = template_spectrum
+
+        # numerator: correlation of the frame with the zero mean template,
+        # denominator: deviation of the frame under the template * deviation of the template
+        corr = cv2.idft(
+            cv2.mulSpectrums(self.spectrum, spectrum, 0, conjB=True),
+            flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE,
+        )
+        numerator = corr[: height - th + 1, : width - tw + 1]
+
+        denominator = self.deviation((th, tw)) * np.float32(np.sqrt(energy))
+
+        # flat areas (no variance) score 0
+        result = np.zeros(numerator.shape, np.float32)
+        np.divide(numerator, denominator, out=result, where=denominator > th * tw)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, max_loc
+
+    def deviation(self, shape):
+        """
+        Gets the (unnormalized) standard deviation of the frame under each position
+        of a template, computed once for each template size.
+
+        Args:
+            shape (tuple): The (height, width) of the template.
+
+        Returns:
+            numpy.ndarray: sqrt of the sum of the squared deviations of each window.
+        """
+        if shape not in self._deviations:
+            th, tw = shape
+            s, q = self.sum, self.sqsum
+            window_sum = s[th:, tw:] - s[:-th, tw:]
+            window_sum -= s[th:, :-tw]
+            window_sum += s[:-th, :-tw]
+            variance = q[th:, tw:] - q[:-th, tw:]
+            variance -= q[th:, :-tw]
+            variance += q[:-th, :-tw]
+            window_sum *= window_sum
+            window_sum /= th * tw
+            variance -= window_sum
+            np.maximum(variance, 0, out=variance)
+            self._deviations[shape] = np.sqrt(variance).astype(np.float32)
+        return self._deviations[shape]
+
+
+def dft_size(shape):
+    """
+    Gets the (padded) DFT size used for a frame.
+
+    Args:
+        shape (tuple): The (height, width) of the frame.
+
+    Returns:
+        tuple: The (height, width) of the DFT.
+    """
+    return (cv2.getOptimalDFTSize(shape[0]), cv2.getOptimalDFTSize(shape[1]))
+
+
+def get_template_spectrum(template, size):
+    """
+    Computes the spectrum of the zero mean template, padded to the DFT size of a frame.
+    The correlation is circular but, as the padded size is at least the frame size,
+    the valid part of the result (template fully inside the frame) isn't wrapped.
+
+    Args:
+        template (numpy.ndarray): The template.
+        size (tuple): The (height, width) of the DFT (see dft_size).
+
+    Returns:
+        tuple: (spectrum, energy) the spectrum and the sum of the squared zero mean template.
+    """
+    zero_mean = template.astype(np.float32)
+    zero_mean -= zero_mean.mean()
+    padded = np.zeros(size, np.float32)
+    padded[: template.shape[0], : template.shape[1]] = zero_mean
+    energy = float(np.square(zero_mean, dtype=np.float64).sum())
+    return cv2.dft(padded), energy
+
+
+def edge_map(img):
+    """
+    Computes the edges of an image (see CHAMFER_CANNY).
+
+    Args:
+        img (numpy.ndarray): The grayscale image.
+
+    Returns:
+        numpy.ndarray: The edges (255) of the image.
+    """
+    return cv2.Canny(img, *CHAMFER_CANNY)
+
+
+def edge_kernel(edges, count=CHAMFER_POINTS):
+    """
+    Computes the edge points of a template compared by DistanceMap: 'count' points
+    spread over its edges.
+
+    Args:
+        edges (numpy.ndarray): The edges of the template (see edge_map).
+        count (int): The maximum number of points. Defaults to CHAMFER_POINTS.
+
+    Returns:
+        numpy.ndarray: The kernel (float32, 1 on the points, 0 elsewhere).
+    """
+    ys, xs = np.nonzero(edges)
+    if len(ys) > count:
+        keep = np.linspace(0, len(ys) - 1, count).astype(int)
+        ys, xs = ys[keep], xs[keep]
+    kernel = np.zeros(edges.shape[:2], np.float32)
+    kernel[ys, xs] = 1
+    return kernel
+
+
+def edge_distance(edges):
+    """
+    Computes the distance of every pixel of a template to its nearest edge, to check
+    that the edges of the frame under a match belong to the template (see DistanceMap).
+
+    Args:
+        edges (numpy.ndarray): The edges of the template (see edge_map).
+
+    Returns:
+        numpy.ndarray: The distances (float32), capped at CHAMFER_MAX_DISTANCE.
+    """
+    distance = cv2.distanceTransform(
+        cv2.bitwise_not(edges), cv2.DIST_L2, cv2.DIST_MASK_3
+    )
+    return np.minimum(distance, CHAMFER_MAX_DISTANCE)
+
+
+class DistanceMap:
+    """
+    Chamfer matching: scores the edges of templates by their distance to the nearest
+    edge of the frame. It doesn't depend on the gray levels, so it suits the elements
+    whose outline is stable but whose colors change (glowing or animated buttons).
+
+    The edges and the distance transform of the frame are computed once and shared by
+    every template matched against this frame; a template then costs one correlation
+    of its edge points with the distance transform.
+
+    The edge points of a template are close to the edges of any busy part of the
+    frame, so the CHAMFER_PEAKS best positions are checked the other way round: the
+    edges of the frame under the template must be close to the edges of the template.
+    The score of a position is 1 - (mean distance) / CHAMFER_MAX_DISTANCE in the
+    direction giving the lowest score: 1 when the edges of the template and the
+    edges of the frame under it are the same.
+    """
+
+    def __init__(self, img):
+        """
+        Args:
+            img (numpy.ndarray): The grayscale frame.
+        """
+        self.edges = edge_map(img)
+        distance = cv2.distanceTransform(
+            cv2.bitwise_not(self.edges), cv2.DIST_L2, cv2.DIST_MASK_3
+        )
+        self.distance = np.minimum(distance, CHAMFER_MAX_DISTANCE)
+        self._edge_counts = {}
+
+    def match(self, kernel, edge_count, template_distance, area=None):
+        """
+        Finds the best match of a template in the frame (or in a part of it).
+
+        Args:
+            kernel (numpy.ndarray): The edge points of the template (see edge_kernel).
+            edge_count (int): The number of edge pixels of the template.
+            template_distance (numpy.ndarray): The distances to the edges of the
+                template (see edge_distance).
+            area (list): [x0, y0, x1, y1] part of the frame to look into.
+                Defaults to None (the whole frame).
+
+        Returns:
+            tuple: (max_val, max_loc) the best score and the top left corner of the match.
+        """
+        x0, y0 = 0, 0
+        distance = self.distance
+        edges = self.edges
+        counts = self.edge_counts(kernel.shape)
+        if area is not None:
+            x0, y0, x1, y1 = area
+            distance = distance[y0:y1, x0:x1]
+            edges = edges[y0:y1, x0:x1]
+            counts = counts[y0 : y1 - kernel.shape[0] + 1, x0 : x1 - kernel.shape[1] + 1]
+        points = float(kernel.sum())
+        if (
+            not points
+            or distance.shape[0] < kernel.shape[0]
+            or distance.shape[1] < kernel.shape[1]
+        ):
+            return -1, (0, 0)
+
+        # sum of the distances under the edge points, at every position
+        result = cv2.matchTemplate(distance, kernel, cv2.TM_CCORR)
+        result *= -1 / (points * CHAMFER_MAX_DISTANCE)
+        result += 1
+        # a window full of edges is close to any template
+        result[counts > CHAMFER_MAX_CLUTTER * max(edge_count, 1)] = 0
+
+        # the other way round on the best positions
+        th, tw = kernel.shape
+        max_val, max_loc = -1, (0, 0)
+        for _ in range(CHAMFER_PEAKS):
+            _, score, _, (x, y) = cv2.minMaxLoc(result)
+            if score <= max(max_val, 0):
+                break
+            window = edges[y : y + th, x : x + tw] > 0
+            frame_points = int(np.count_nonzero(window))
+            reverse = 1 - float(template_distance[window].sum()) / (
+                max(frame_points, 1) * CHAMFER_MAX_DISTANCE
+            )
+            score = min(score, reverse)
+            if score > max_val:
+                max_val, max_loc = score, (x, y)
+            # next peak: away from this one
+            result[
+                max(0, y - th // 4) : y + th // 4 + 1,
+                max(0, x - tw // 4) : x + tw // 4 + 1,
+            ] = 0
+        return max_val, (max_loc[0] + x0, max_loc[1] + y0)
+
+    def edge_counts(self, shape):
+        """
+        Gets the number of edge pixels of the frame under each position of a template,
+        computed once for each template size.
+
+        Args:
+            shape (tuple): The (height, width) of the template.
+
+        Returns:
+            numpy.ndarray: The number of edge pixels of each window.
+        """
+        if shape not in self._edge_counts:
+            th, tw = shape
+            total = cv2.integral(self.edges // 255)
+            counts = total[th:, tw:] - total[:-th, tw:] - total[th:, :-tw]
+            counts += total[:-th, :-tw]
+            self._edge_counts[shape] = counts
+        return self._edge_counts[shape]
@@ -7,6 +7,7 @@ Functions:
 - mouse_position: Get the current mouse position relative to a given window.
 - move_mouse_and_click: Move the mouse to specified coordinates within a window and perform a click.
 - move_mouse: Move the mouse to specified coordinates within a window.
+- input_count: Get the number of mouse inputs sent so far.
 
 Constants:
 - MOUSE_RANGE: The range of random mouse movement.
@@ -27,6 +28,25 @@ MOUSE_RANGE = 2
 
 log = logging.getLogger(__name__)
 
+_input_count = 0
+
+
+def input_count():
+    """
+    Retrieves the number of mouse inputs (moves, clicks, scrolls) sent so far.
+    Screenshots taken before the last input may not reflect the screen anymore.
+
+    Returns:
+        int: The number of mouse inputs.
+    """
+    return _input_count
+
+
+def _record_input():
+    global _input_count
+    _input_count += 1
+
+
 def mouse_click(btn="left"):
     """
     Simulates a mouse click.
@@ -34,6 +54,7 @@ def mouse_click(btn="left"):
     Args:
         btn (str, optional): Specifies the button to click. Defaults to "left".
     """
+    _record_input()
     click(button=btn)
 
 
@@ -46,6 +67,7 @@ def mouse_scroll(s):
     """
     if s == 0:
         return
+    _record_input()
     step = s // abs(s)
     for _ in range(0, s, step):
         scroll(step)
@@ -77,6 +99,7 @@ def move_mouse_and_click(window, x, y):
     move_mouse(window, x, y)
     rsleep(0.05)
     log.info("Clicking at %s, %s", x, y)
+    _record_input()
     click()
 
 
@@ -88,6 +111,7 @@ def move_mouse(window, x, y):
         y (int): The y-coordinate for the mouse to move to, relative to the window.
     """
 
+    _record_input()
     fromPoint = position()
     toPoint = (window[0] + x, window[1] + y)
     hc = HumanClicker()
@@ -102,3 +126,5 @@ def move_mouse(window, x, y):
         hc.move((x, y), duration=duration, humanCurve=human_curve)
     except Exception:
         hc.move((x, y), duration=duration, humanCurve=human_curve)
+    # screenshots taken during the move are outdated too
+    _record_input()
@@ -6,6 +6,7 @@ import psutil
 from modules.battlenetloop import enter_from_battlenet
 from modules.mouse_utils import move_mouse_and_click
 from modules.platforms import windowMP
+from modules.screen_catalog import screen_catalog
 from modules.utils import rsleep
 
 
@@ -14,14 +15,9 @@ def choose_mode():
     This is to address the new Menu released 6.28.23
     Blizzard moved Mercenaries into Modes menu
     """
-    mode_coord_x = 1337 / 1920
-    mode_coord_y = 276 / 1080
-    choose_coord_x = 1367 / 1920
-    choose_coord_y = 750 / 1080
-
-    move_mouse_and_click(windowMP( ), windowMP( )[2] * mode_coord_x, windowMP( )[3] * mode_coord_y)
+    move_mouse_and_click(windowMP(), *screen_catalog.target("choose_mode", "mode"))
     rsleep(1)
-    move_mouse_and_click(windowMP( ), windowMP( )[2] * choose_coord_x, windowMP( )[3] * choose_coord_y)
+    move_mouse_and_click(windowMP(), *screen_catalog.target("choose_mode", "choose"))
 
 
 def click_wipe_button():
@@ -32,10 +28,7 @@ def click_wipe_button():
 
     The click coords may be off and still requires testing.
     """
-    wipe_coord_x = 948 / 1920
-    wipe_coord_y = 647 / 1080
-
-    move_mouse_and_click(windowMP( ), windowMP( )[2] * wipe_coord_x, windowMP( )[3] * wipe_coord_y)
+    move_mouse_and_click(windowMP(), *screen_catalog.target("partywipe", "wipe"))
     rsleep(0.3)
 
 
@@ -47,10 +40,9 @@ def click_reconnect():
 
     Usually it's called multiple times as the screen can appear back to back after clicking reconnect.
     """
-    rcbutton_coord_x = 773 / 1920
-    rcbutton_coord_y = 840 / 1080
-
-    move_mouse_and_click(windowMP( ), windowMP( )[2] * rcbutton_coord_x, windowMP( )[3] * rcbutton_coord_y)
+    move_mouse_and_click(
+        windowMP(), *screen_catalog.target("reconnect_button", "reconnect")
+    )
     rsleep(0.3)
 
 
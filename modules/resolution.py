@@ -4,24 +4,31 @@ This module provides image-related functions for resizing and generating images
 Functions:
 - resize_image: Resize an image from source to destination.
 - check_resolution: Check if the window resolution matches the settings resolution.
+- list_images: List the images of a directory.
+- file_hash: Get the hash of a file.
+- sync_resized_images: Generate the missing or outdated resized images of a directory.
 - gen_images_new_resolution: Generate images for the new resolution.
 
 Note: This module requires the 'cv2' and 'os' libraries.
 """
 
+import hashlib
 import logging
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import cv2
 
-from modules.file_utils import copy_dir_and_func_files
+from modules.file_utils import readjson, writejson
 from modules.settings import settings_dict
 
 log = logging.getLogger(__name__)
 
 BASEDIR = settings_dict["root_images_dir"]
 orig_resolution = settings_dict["default_resolution"]
+# hashes of the sources of the generated images (in each generated directory)
+MANIFEST = "manifest.json"
 
 
 def resize_image(srcfile, dstfile, params=[]):
@@ -72,15 +79,121 @@ def check_resolution(real_w, real_h):
         
 
 
+def list_images(srcdir):
+    """
+    Lists the PNG images of a directory (and of its subdirectories).
+
+    Args:
+        srcdir (str): The directory.
+
+    Returns:
+        list: The paths of the images, relative to 'srcdir' (like "buttons/play.png").
+    """
+    images = []
+    for dirpath, _, filenames in os.walk(srcdir):
+        subdir = os.path.relpath(dirpath, srcdir).replace(os.sep, "/")
+        for filename in filenames:
+            if filename.endswith(".png"):
+                images.append(filename if subdir == "." else f"{subdir}/{filename}")
+    return sorted(images)
+
+
+def file_hash(path):
+    """Returns the SHA-1 of the content of a file."""
+    with open(path, "rb") as descriptor:
+        return hashlib.sha1(descriptor.read()).hexdigest()
+
+
+def sync_resized_images(srcdir, dstdir, params):
+    """
+    Generates the images of 'dstdir' from the images of 'srcdir' with resize_image.
+    Only the missing images and the ones whose source changed are generated: the hash
+    of the source of each image is kept in a manifest (MANIFEST in 'dstdir').
+    The images are generated on a process pool.
+
+    Args:
+        srcdir (str): The directory of the original images.
+        dstdir (str): The directory of the generated images.
+        params (list): The parameters of resize_image ([orig_resolution, new_resolution]).
+
+    Returns:
+        int: The number of generated images.
+    """
+    manifest_file = f"{dstdir}/{MANIFEST}"
+    manifest = {}
+    if os.path.isfile(manifest_file):
+        try:
+            manifest = readjson(manifest_file)
+        except ValueError as error:
+            log.warning("Ignoring corrupted manifest %s: %s", manifest_file, error)
+
+    new_manifest = {}
+    todo = []
+    for image in list_images(srcdir):
+        srcfile, dstfile = f"{srcdir}/{image}", f"{dstdir}/{image}"
+        stat = os.stat(srcfile)
+        entry = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+        old_entry = manifest.get(image, {})
+        generated = os.path.isfile(dstfile)
+        # same size and date: the source didn't change, no need to hash it
+        if (
+            generated
+            and old_entry.get("mtime") == entry["mtime"]
+            and old_entry.get("size") == entry["size"]
+        ):
+            new_manifest[image] = old_entry
+            continue
+        entry["sha1"] = file_hash(srcfile)
+        new_manifest[image] = entry
+        if not generated or old_entry.get("sha1") != entry["sha1"]:
+            todo.append((srcfile, dstfile))
+
+    # images whose source was removed
+    for image in manifest.keys() - new_manifest.keys():
+        if os.path.isfile(f"{dstdir}/{image}"):
+            os.remove(f"{dstdir}/{image}")
+
+    if len(todo) > 1:
+        log.info("Generating %s images in %s", len(todo), dstdir)
+        with ProcessPoolExecutor() as pool:
+            # list() to raise the errors of the workers
+            list(
+                pool.map(
+                    resize_image,
+                    [srcfile for srcfile, _ in todo],
+                    [dstfile for _, dstfile in todo],
+                    [params] * len(todo),
+                    chunksize=16,
+                )
+            )
+    elif todo:
+        resize_image(*todo[0], params)
+    else:
+        log.debug("Images of %s up to date", dstdir)
+
+    if new_manifest != manifest:
+        writejson(manifest_file, new_manifest)
+    return len(todo)
+
+
 def gen_images_new_resolution():
     """
-    It appears that this function resizes the base images to scale to new resolutions.
+    Resizes the base images (and the images of each locale) to the setting resolution.
+    Only the images missing or changed since the last run are generated.
+    Nothing is generated when the images are scaled in memory ('scale_in_memory' setting).
     """
     new_resolution = settings_dict["resolution"]
-
     ox, oy = orig_resolution.split("x")
     nx, ny = new_resolution.split("x")
 
+    if settings_dict["scale_in_memory"]:
+        # the images are scaled in memory the same way: same ratio check
+        if round(int(ox) / int(oy), 2) != round(int(nx) / int(ny), 2):
+            log.error("Resolution doesn't have the same ratio as %s", orig_resolution)
+            raise ValueError("Resolution doesn't have the same ratio")
+        log.debug("Images of %s scaled in memory", orig_resolution)
+        return
+
     if orig_resolution == new_resolution:
         log.debug("Resolution not changed : %s", orig_resolution)
     else:
@@ -92,13 +205,21 @@ def gen_images_new_resolution():
             # Resolution modified so we need to generate images
             # we check it's the same ratio as the original images
             if round(int(ox) / int(oy), 2) == round(int(nx) / int(ny), 2):
-                copy_dir_and_func_files(
+                params = [orig_resolution, new_resolution]
+                sync_resized_images(
                     f"{BASEDIR}/{orig_resolution}",
                     f"{BASEDIR}/{new_resolution}",
-                    ".png",
-                    resize_image,
-                    [orig_resolution, new_resolution],
+                    params,
                 )
+                i18n_dir = f"{BASEDIR}/i18n"
+                if os.path.isdir(i18n_dir):
+                    for locale in sorted(os.listdir(i18n_dir)):
+                        if os.path.isdir(f"{i18n_dir}/{locale}/{orig_resolution}"):
+                            sync_resized_images(
+                                f"{i18n_dir}/{locale}/{orig_resolution}",
+                                f"{i18n_dir}/{locale}/{new_resolution}",
+                                params,
+                            )
             else:
                 log.error(
                     "Resolution doesn't have the same ratio as %s", orig_resolution
@@ -0,0 +1,111 @@
+"""
+This module provides the index of the regions of interest (ROI) learned for each template.
+
+Most UI elements and buttons always appear in the same area of the window. Each time
+a template is found in a full window screenshot, its bounding box is merged into the
+region of interest of this template (for this frame size), so the next searches can
+look into this region first.
+
+Classes:
+- RoiIndex: Persisted index of the regions of interest.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from modules.file_utils import readjson, writejson
+
+log = logging.getLogger(__name__)
+
+SAVE_INTERVAL = 60
+
+
+class RoiIndex:
+    """
+    Regions of interest learned for each template, keyed by frame size ("WxH")
+    then by template, saved in a JSON file:
+
+        {"1920x1080": {"UI_elements/campfire.png": [x0, y0, x1, y1]}}
+    """
+
+    def __init__(self, filename):
+        """
+        Loads the index from 'filename' (if it exists) and saves it at exit.
+
+        Args:
+            filename (str): The JSON file of the index.
+        """
+        self.filename = filename
+        self._index = {}
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        if os.path.isfile(filename):
+            try:
+                self._index = readjson(filename)
+            except ValueError as error:
+                log.warning("Ignoring corrupted ROI index %s: %s", filename, error)
+        atexit.register(self.save)
+
+    def get(self, size, template):
+        """
+        Gets the region of interest of a template.
+
+        Args:
+            size (str): The frame size ("WxH").
+            template (str): The template name (like "buttons/play.png").
+
+        Returns:
+            list or None: [x0, y0, x1, y1] or None if the template was never found.
+        """
+        return self._index.get(size, {}).get(template)
+
+    def learn(self, size, template, bbox):
+        """
+        Merges the bounding box where a template was found into its region of interest.
+
+        Args:
+            size (str): The frame size ("WxH").
+            template (str): The template name (like "buttons/play.png").
+            bbox (list): [x0, y0, x1, y1] of the template in the frame.
+        """
+        bbox = [int(v) for v in bbox]
+        with self._lock:
+            rois = self._index.setdefault(size, {})
+            roi = rois.get(template)
+            if roi is None:
+                rois[template] = bbox
+            elif not (
+                roi[0] <= bbox[0] and roi[1] <= bbox[1]
+                and roi[2] >= bbox[2] and roi[3] >= bbox[3]
+            ):
+                rois[template] = [
+                    min(roi[0], bbox[0]),
+                    min(roi[1], bbox[1]),
+                    max(roi[2], bbox[2]),
+                    max(roi[3], bbox[3]),
+                ]
+            else:
+                return
+            self._dirty = True
+            log.debug("ROI of %s (%s): %s", template, size, rois[template])
+
+        if time.monotonic() - self._last_save > SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """
+        Saves the index if it was modified.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                writejson(self.filename, self._index)
+                self._dirty = False
+            except OSError as error:
+                log.warning("Couldn't save ROI index %s: %s", self.filename, error)
+            self._last_save = time.monotonic()
@@ -0,0 +1,207 @@
+"""
+This module provides the screen catalog: the screens of the game declared in
+conf/system/screens.json (and conf/user/screens.json), compiled once.
+
+Each screen declares the templates identifying it, the area of the window where
+they appear, its click targets and the screens expected after it:
+
+    "choose_mode": {
+        "templates": ["buttons/choose_mode.png"],
+        "groups": ["where"],
+        "roi": [x0, y0, x1, y1],
+        "targets": {"mode": [1337, 276], "choose": [1367, 750]},
+        "next": ["battle_portal", "battle", "free_battle"],
+        "priority": 1
+    }
+
+The positions are pixels of the reference resolution (1920x1080), scaled to the game
+window. "roi" is optional (the whole window by default): the templates of a screen are
+looked for in its area first, then in the whole window, so it should contain them with a
+margin. "groups" lists the screen
+classifiers the screen belongs to ("where": gameloop.where, "map": bounty.goToEncounter);
+the screens of a group are probed in the order of the file until transitions are learned.
+"priority" ranks the screens shown together: the popups (0) are probed before the
+screens (1, the default), and the screens other ones are shown over (2, like
+view_party behind the buttons of the map) last. The learned transitions only change
+the order of the screens of the same priority.
+
+Classes:
+- CatalogScreen: A screen of the catalog.
+- ScreenCatalog: The compiled screen catalog.
+"""
+
+import logging
+from collections import namedtuple
+
+from modules.platforms import windowMP
+from modules.settings import jscreens, settings_dict
+
+log = logging.getLogger(__name__)
+
+# priority of the screens (see CatalogScreen): popups 0, screens shown over others 2
+DEFAULT_PRIORITY = 1
+
+
+class CatalogScreen(
+    namedtuple("CatalogScreen", "name templates roi targets next groups priority")
+):
+    """
+    A screen of the catalog.
+
+    Attributes:
+    name: The name of the screen (like "choose_mode").
+    templates: The templates identifying the screen (like ["buttons/choose_mode.png"]).
+    roi: The [x0, y0, x1, y1] area of the templates, in reference pixels.
+    targets: {target name: [x, y]} the click targets, in reference pixels.
+    next: The names of the screens expected after this one.
+    groups: The names of the screen classifiers the screen belongs to.
+    priority: The rank of the screen when several are shown together (lowest first).
+    """
+
+
+class ScreenCatalog:
+    """
+    The screens of the catalog, with their areas and targets scaled once for each
+    window size.
+    """
+
+    def __init__(self, catalog, reference):
+        """
+        Compiles a catalog.
+
+        Args:
+            catalog (dict): The content of screens.json.
+            reference (str): The resolution of the positions (like "1920x1080").
+
+        Raises:
+            ValueError: If a screen is invalid.
+        """
+        width, height = (int(value) for value in reference.split("x"))
+        self.reference = (width, height)
+        self.screens = {}
+        self._groups = {}
+        self._scaled = {}
+        for name, entry in catalog.items():
+            if not isinstance(entry, dict):
+                # like "lastOne"
+                continue
+            if not entry.get("templates"):
+                raise ValueError(f"screens.json: no template for {name}")
+            x0, y0, x1, y1 = entry.get("roi", [0, 0, width, height])
+            if not (0 <= x0 < x1 <= width and 0 <= y0 < y1 <= height):
+                raise ValueError(f"screens.json: invalid roi for {name}")
+            screen = CatalogScreen(
+                name,
+                list(entry["templates"]),
+                list(entry.get("roi", [0, 0, width, height])),
+                {target: list(xy) for target, xy in entry.get("targets", {}).items()},
+                list(entry.get("next", [])),
+                list(entry.get("groups", [])),
+                int(entry.get("priority", DEFAULT_PRIORITY)),
+            )
+            self.screens[name] = screen
+            for group in screen.groups:
+                self._groups.setdefault(group, []).append(screen)
+
+        for screen in self.screens.values():
+            unknown = [name for name in screen.next if name not in self.screens]
+            if unknown:
+                raise ValueError(
+                    f"screens.json: unknown screens after {screen.name}: {unknown}"
+                )
+        log.debug(
+            "Screen catalog: %s screens, groups: %s",
+            len(self.screens),
+            {group: len(screens) for group, screens in self._groups.items()},
+        )
+
+    def __contains__(self, name):
+        return name in self.screens
+
+    def group(self, group):
+        """
+        Gets the screens of a classifier.
+
+        Args:
+            group (str): The name of the group (like "where").
+
+        Returns:
+            list: The CatalogScreens of the group, in the order of the file.
+        """
+        return self._groups.get(group, [])
+
+    def successors(self, name):
+        """
+        Gets the screens expected after a screen.
+
+        Args:
+            name (str): The name of the screen (or None).
+
+        Returns:
+            list: The names of the screens (empty for an unknown screen).
+        """
+        screen = self.screens.get(name)
+        return [] if screen is None else screen.next
+
+    def _scale(self, size):
+        """
+        Scales the areas and the targets to a window size, once for each size.
+
+        Returns:
+            dict: {screen name: (area, targets)} in window pixels.
+        """
+        if size not in self._scaled:
+            fx = size[0] / self.reference[0]
+            fy = size[1] / self.reference[1]
+            self._scaled[size] = {
+                name: (
+                    [
+                        int(screen.roi[0] * fx),
+                        int(screen.roi[1] * fy),
+                        -int(-screen.roi[2] * fx),
+                        -int(-screen.roi[3] * fy),
+                    ],
+                    {
+                        target: (x * fx, y * fy)
+                        for target, (x, y) in screen.targets.items()
+                    },
+                )
+                for name, screen in self.screens.items()
+            }
+        return self._scaled[size]
+
+    def region(self, name, window=None):
+        """
+        Gets the part of the screen where the templates of a screen appear.
+
+        Args:
+            name (str): The name of the screen.
+            window (tuple): The game window geometry. Defaults to None (windowMP()).
+
+        Returns:
+            list or None: [width, height, top, left] in absolute screen coordinates
+            (like image_utils.find_elements), or None for the whole window.
+        """
+        window = windowMP() if window is None else window
+        x0, y0, x1, y1 = self._scale((window[2], window[3]))[name][0]
+        if x0 <= 0 and y0 <= 0 and x1 >= window[2] and y1 >= window[3]:
+            return None
+        return [x1 - x0, y1 - y0, window[1] + y0, window[0] + x0]
+
+    def target(self, name, target, window=None):
+        """
+        Gets a click target of a screen.
+
+        Args:
+            name (str): The name of the screen (like "choose_mode").
+            target (str): The name of the target (like "mode").
+            window (tuple): The game window geometry. Defaults to None (windowMP()).
+
+        Returns:
+            tuple: The (x, y) position relative to the window.
+        """
+        window = windowMP() if window is None else window
+        return self._scale((window[2], window[3]))[name][1][target]
+
+
+screen_catalog = ScreenCatalog(jscreens, settings_dict["default_resolution"])
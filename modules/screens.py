@@ -0,0 +1,138 @@
+"""
+This module provides the screen classifier: the screen shown by the game, recognized
+on one frame. The screens are declared in the screen catalog (see ScreenCatalog) and
+probed from the most likely one after the previous screen (see TransitionModel),
+within a time budget, each in its area of the window.
+
+Functions:
+- catalog_screens: Get the screens of a group of the screen catalog.
+- classify_screen: Find the screen shown by the game.
+
+Classes:
+- Screen: A screen of the game and the template identifying it.
+- ScreenState: The screen found on a frame.
+"""
+
+import logging
+import time
+from collections import namedtuple
+
+from modules.image_utils import get_frame, match_on_frame
+from modules.platforms import windowMP
+from modules.screen_catalog import screen_catalog
+from modules.settings import settings_dict
+from modules.transitions import TransitionModel
+
+log = logging.getLogger(__name__)
+
+transitions = TransitionModel(f"{settings_dict['cache_dir']}/transitions.json")
+
+
+class Screen(namedtuple("Screen", "name file priority")):
+    """
+    A screen of the game (or a popup). A screen can have several entries, one for
+    each template identifying it.
+
+    Attributes:
+    name: The name of the screen (like "view_party").
+    file: The template identifying the screen (like "UI_elements/view_party.png").
+    priority: The rank of the screen when several are shown together (lowest first,
+        see CatalogScreen).
+    """
+
+
+def catalog_screens(group):
+    """
+    Gets the Screens of a group of the screen catalog, one for each template.
+
+    Args:
+    group (str): The name of the group (like "where").
+
+    Returns:
+    list: The Screens, in the order of the catalog.
+    """
+    return [
+        Screen(screen.name, file, screen.priority)
+        for screen in screen_catalog.group(group)
+        for file in screen.templates
+    ]
+
+
+# screens of where() and steps of the bounty map (see bounty.goToEncounter),
+# declared in screens.json
+SCREENS = catalog_screens("where")
+MAP_SCREENS = catalog_screens("map")
+
+
+class ScreenState(namedtuple("ScreenState", "name confidence result")):
+    """
+    The screen found on a frame.
+
+    Attributes:
+    name: The name of the screen, or None if no screen was recognized.
+    confidence: How far above its threshold the template scored, from 0 (at the
+        threshold) to 1 (perfect match). 0 if no screen was recognized.
+    result: The MatchResult of the template of the screen (None if no screen was recognized).
+    """
+
+    @property
+    def known(self):
+        """True if a screen was recognized."""
+        return self.name is not None
+
+
+def classify_screen(screens=SCREENS, budget=None):
+    """
+    Finds the screen shown by the game: the templates of the screens are matched
+    against the same frame, in the area of their screen (see ScreenCatalog.region)
+    then in the whole frame, by priority (the popups first, the screens shown behind other ones last), then
+    from the most likely screen after the previous one (and the cheapest template,
+    see TransitionModel.order), until one is found or the time budget is spent.
+    The screen found is recorded as a transition.
+
+    Args:
+    screens (list): The Screens to recognize. Defaults to SCREENS.
+    budget (float): The time budget (in seconds), at least one template being matched.
+        Defaults to None (the 'probe_budget' setting).
+
+    Returns:
+    ScreenState: The screen found, or an unknown screen.
+    """
+    start = time.perf_counter()
+    budget = settings_dict["probe_budget"] if budget is None else budget
+    frame = get_frame()
+    window = windowMP()
+
+    probes = 0
+    expected = screen_catalog.successors(transitions.previous)
+    for screen in transitions.order(screens, expected=expected):
+        if probes and time.perf_counter() - start > budget:
+            log.debug("Screen: probe budget spent after %s probe(s)", probes)
+            break
+        region = screen_catalog.region(screen.name, window)
+        part = frame if region is None else frame.crop(region) or frame
+        result = match_on_frame(part, screen.file, learn_roi=True, window=window)
+        duration = 0 if result.reused else result.duration
+        if part is not frame and not result.found:
+            # not in the area of the catalog: maybe elsewhere (like a new layout)
+            result = match_on_frame(frame, screen.file, learn_roi=True, window=window)
+            duration += 0 if result.reused else result.duration
+        if duration:
+            # the cost of the real matches (not of reused results)
+            transitions.measure(screen.file, duration)
+        probes += 1
+        if result.found:
+            confidence = (result.score - result.threshold) / max(
+                1 - result.threshold, 1e-6
+            )
+            state = ScreenState(screen.name, min(1.0, confidence), result)
+            log.info(
+                "Screen: %s (confidence %.2f, %s probe(s))",
+                screen.name,
+                state.confidence,
+                probes,
+            )
+            transitions.observe(screen.name)
+            return state
+    log.debug("Screen: unknown")
+    return ScreenState(None, 0, None)
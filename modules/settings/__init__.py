@@ -5,6 +5,7 @@ Fetches all settings from settings files used by app
 from modules.settings.conf import (
     jthreshold,
     jposition,
+    jscreens,
     mercslist,
     mercsAbilities,
     ability_order,
@@ -16,6 +17,7 @@ from modules.settings.conf import (
 __all__ = [
     "jthreshold",
     "jposition",
+    "jscreens",
     "mercslist",
     "mercsAbilities",
     "ability_order",
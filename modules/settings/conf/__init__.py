@@ -23,6 +23,7 @@ _root_settings_dict = _get_config()
 
 jthreshold = _root_settings_dict["thresholds.json"]
 jposition = _root_settings_dict["positions.json"]
+jscreens = _root_settings_dict["screens.json"]
 mercslist = _root_settings_dict["mercs.json"]
 mercsAbilities = _root_settings_dict["attacks.json"]
 ability_order = _root_settings_dict["combo.ini"]
@@ -32,6 +33,7 @@ treasures_priority = _root_settings_dict["treasures.json"]
 __all__ = [
     "jthreshold",
     "jposition",
+    "jscreens",
     "mercslist",
     "mercsAbilities",
     "ability_order",
@@ -33,6 +33,7 @@ config_files = [
     "mercs.json",
     "settings.ini",
     "positions.json",
+    "screens.json",
     "thresholds.json",
     "treasures.json",
 ]
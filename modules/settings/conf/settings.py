@@ -20,12 +20,14 @@ log = logging.getLogger(__name__)
 
 DEFAULT_RESOLUTION = "1920x1080"
 BASE_IMAGES_DIR = "files"
+CACHE_DIR = "cache"
 
 
 def add_bot_settings(set_dict):
     """
     Adds bot specific settings to a settings dictionary. The settings added include
-    default resolution, root images directory, images directory and user files directory.
+    default resolution, root images directory, images directory, user files directory
+    and cache directory.
 
     Args:
         set_dict (dict): The original settings dictionary.
@@ -40,6 +42,7 @@ def add_bot_settings(set_dict):
         BASE_IMAGES_DIR, DEFAULT_RESOLUTION
     ).as_posix()
     set_dict["user_files_dir"] = pathlib.PurePath("conf", "user").as_posix()
+    set_dict["cache_dir"] = CACHE_DIR
     #    print(set_dict["user_files_dir"])
     #    print(set_dict["images_dir"])
     return set_dict
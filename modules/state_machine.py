@@ -0,0 +1,288 @@
+"""
+This module provides an event-driven state machine engine, used to run the bot as
+explicit states and transitions instead of nested polling loops.
+
+The machine waits in a state until an event arrives: events are posted (like the
+events returned by State.on_enter, see StateMachine.post) and fire a transition as
+soon as they arrive, or are produced by event sources (like screen_events) polled
+while no event is waiting. Each state can have a timeout: a state left without
+progress for its timeout fires a TIMEOUT event, and a state with no transition for
+it is stuck (StuckState is raised). UNKNOWN events (nothing recognized) aren't
+progress: they don't restart the timeout, and the sources are polled again after
+the settle delay of the state only (like a loading screen).
+
+Only the map of a bounty (see bounty.goToEncounter) runs on a state machine, fed
+by screen events. The screens outside a bounty (gameloop.where) and the battle
+still run their own loops; the battle waits for the log instead of polling (see
+LogHSMercs.wait_eof).
+
+Functions:
+- screen_events: Make an event source recognizing the screen shown by the game.
+
+Classes:
+- Event: An event received by a state machine.
+- State: A state of a state machine.
+- Transition: A transition between two states.
+- StateMachine: The state machine engine.
+"""
+
+import logging
+import queue
+import time
+from collections import namedtuple
+
+from modules.exceptions import StuckState
+from modules.image_utils import invalidate_frame
+from modules.screens import SCREENS, classify_screen
+
+log = logging.getLogger(__name__)
+
+# event fired when a state times out
+TIMEOUT = "timeout"
+# event name matching every event in a transition
+ANY = "*"
+# event of a screen that wasn't recognized (see screen_events)
+UNKNOWN = "unknown"
+# seconds between two polls of the event sources
+POLL_INTERVAL = 0.5
+
+
+class Event(namedtuple("Event", "name data")):
+    """
+    An event received by a state machine.
+
+    Attributes:
+    name: The name of the event (like "play" or "timeout").
+    data: The data of the event (like the ScreenState of a screen event), or None.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, name, data=None):
+        return super().__new__(cls, name, data)
+
+
+class State(namedtuple("State", "name on_enter timeout settle final")):
+    """
+    A state of a state machine.
+
+    Attributes:
+    name: The name of the state.
+    on_enter: Called with the event entering the state (None at start). It can return
+        an event name (or an Event) posted right away. None for no action.
+    timeout: Seconds before a TIMEOUT event if no transition fires (None: no timeout).
+    settle: Seconds to wait before polling the event sources in this state, and
+        after an UNKNOWN event (like the animations of a screen). Posted events
+        aren't delayed.
+    final: True if the machine stops in this state.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, name, on_enter=None, timeout=None, settle=0, final=False):
+        return super().__new__(cls, name, on_enter, timeout, settle, final)
+
+
+class Transition(namedtuple("Transition", "source event target guard action")):
+    """
+    A transition between two states.
+
+    Attributes:
+    source: The state the transition leaves.
+    event: The event name firing the transition (ANY for every event).
+    target: The state the transition enters (the same state to stay in it,
+        its timeout being restarted, except for an UNKNOWN event).
+    guard: Called with the event: the transition fires only if it returns True
+        (None: always).
+    action: Called with the event when the transition fires (None: no action).
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, source, event, target, guard=None, action=None):
+        return super().__new__(cls, source, event, target, guard, action)
+
+
+class StateMachine:
+    """
+    An event-driven state machine: the transitions of the current state are checked
+    for each event received, in their declaration order (the ones of the event first,
+    then the ANY ones); events without transition are ignored.
+    """
+
+    def __init__(self, name, states, transitions, initial):
+        """
+        Builds a state machine and checks its structure: the transitions must join
+        declared states and a final state must be reachable from every state.
+
+        Args:
+            name (str): The name of the machine (for the logs).
+            states (list): The States.
+            transitions (list): The Transitions.
+            initial (str): The name of the initial state.
+
+        Raises:
+            ValueError: If the structure of the machine is invalid.
+        """
+        self.name = name
+        self.states = {state.name: state for state in states}
+        self.transitions = {}
+        for transition in transitions:
+            for state in (transition.source, transition.target):
+                if state not in self.states:
+                    raise ValueError(f"{name}: unknown state {state}")
+            self.transitions.setdefault(transition.source, []).append(transition)
+        if initial not in self.states:
+            raise ValueError(f"{name}: unknown initial state {initial}")
+        self.initial = initial
+        self.state = None
+        self._entered = None
+        self._poll_after = None
+        self._events = queue.Queue()
+        self._check_final_states()
+
+    def _check_final_states(self):
+        """Checks that a final state is reachable from every state."""
+        reachable = {name for name, state in self.states.items() if state.final}
+        changed = True
+        while changed:
+            changed = False
+            for source, transitions in self.transitions.items():
+                if source not in reachable and any(
+                    transition.target in reachable for transition in transitions
+                ):
+                    reachable.add(source)
+                    changed = True
+        dead_ends = sorted(set(self.states) - reachable)
+        if dead_ends:
+            raise ValueError(f"{self.name}: no way out of {', '.join(dead_ends)}")
+
+    def post(self, name, data=None):
+        """
+        Posts an event (from any thread): the transition fires as soon as the
+        machine gets it.
+
+        Args:
+            name (str or Event): The event name (or the Event).
+            data: The data of the event. Defaults to None.
+        """
+        self._events.put(name if isinstance(name, Event) else Event(name, data))
+
+    def run(self, sources=(), poll_interval=POLL_INTERVAL):
+        """
+        Runs the machine from its initial state until a final state.
+
+        Args:
+            sources (list): Functions called (in this order) while no event is waiting,
+                returning an Event or None (like screen_events). Defaults to none.
+            poll_interval (float): The maximum time (in seconds) between two polls
+                of the sources. Defaults to POLL_INTERVAL.
+
+        Returns:
+            str: The name of the final state.
+
+        Raises:
+            StuckState: If a state times out without a transition for it.
+        """
+        self._enter(self.states[self.initial], None)
+        while not self.state.final:
+            event = self._next_event(sources, poll_interval)
+            transition = self._find_transition(event)
+            if transition is None:
+                if event.name == TIMEOUT:
+                    raise StuckState(
+                        f"{self.name}: stuck in {self.state.name}"
+                        f" for {self.state.timeout}s"
+                    )
+                log.debug("%s: %s ignored in %s", self.name, event.name, self.state.name)
+                continue
+            log.debug(
+                "%s: %s -(%s)-> %s",
+                self.name,
+                self.state.name,
+                event.name,
+                transition.target,
+            )
+            if transition.action is not None:
+                transition.action(event)
+            if transition.target == self.state.name and event.name == UNKNOWN:
+                # nothing recognized: no progress, the timeout keeps running
+                self._poll_after = time.monotonic() + max(
+                    self.state.settle, poll_interval
+                )
+                continue
+            self._enter(self.states[transition.target], event)
+        return self.state.name
+
+    def _enter(self, state, event):
+        self.state = state
+        self._entered = time.monotonic()
+        self._poll_after = self._entered + state.settle
+        if state.on_enter is not None:
+            posted = state.on_enter(event)
+            if posted is not None:
+                self.post(posted)
+
+    def _next_event(self, sources, poll_interval):
+        """
+        Gets the next event: a posted one, then one of the sources (once the state
+        is settled), waiting for a posted one between two polls. TIMEOUT when the
+        state times out.
+        """
+        while True:
+            now = time.monotonic()
+            elapsed = now - self._entered
+            if self.state.timeout is not None and elapsed > self.state.timeout:
+                return Event(TIMEOUT)
+            try:
+                return self._events.get_nowait()
+            except queue.Empty:
+                pass
+
+            if now >= self._poll_after:
+                for source in sources:
+                    event = source()
+                    if event is not None:
+                        return event
+                wait = poll_interval
+            else:
+                wait = self._poll_after - now
+            if self.state.timeout is not None:
+                wait = min(wait, max(0, self.state.timeout - elapsed))
+            try:
+                return self._events.get(timeout=wait)
+            except queue.Empty:
+                pass
+
+    def _find_transition(self, event):
+        transitions = self.transitions.get(self.state.name, [])
+        for name in (event.name, ANY):
+            for transition in transitions:
+                if transition.event != name or (
+                    name == ANY and event.name == TIMEOUT
+                ):
+                    continue
+                if transition.guard is None or transition.guard(event):
+                    return transition
+        return None
+
+
+def screen_events(screens=SCREENS):
+    """
+    Makes an event source recognizing the screen shown by the game (see
+    screens.classify_screen) on a new frame each time it's polled.
+
+    Args:
+        screens (list): The Screens to recognize. Defaults to SCREENS.
+
+    Returns:
+        function: The source, returning an Event named after the screen (UNKNOWN if
+        no screen was recognized), with the ScreenState as data.
+    """
+
+    def source():
+        invalidate_frame()
+        state = classify_screen(screens)
+        return Event(state.name if state.known else UNKNOWN, state)
+
+    return source
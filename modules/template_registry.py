@@ -0,0 +1,145 @@
+"""
+This module provides the template registry: every template of the setting resolution
+resolved once (locale override, threshold, search options) so the probes don't have to
+look for the files and the thresholds each time.
+
+Classes:
+- Template: A resolved template.
+- TemplateRegistry: The templates of a resolution and a locale.
+"""
+
+import logging
+import os
+from collections import namedtuple
+
+from modules.exceptions import MissingTemplate
+
+log = logging.getLogger(__name__)
+
+
+class Template(
+    namedtuple("Template", "name path threshold no_pyramid signature engine")
+):
+    """
+    A resolved template.
+
+    Attributes:
+    name: The template name (like "buttons/play.png").
+    path: The file of the template (like "files/1920x1080/buttons/play.png").
+    threshold: The matching threshold of the template (of its engine).
+    no_pyramid: True if the template must be searched at full resolution only.
+    signature: True if a few pixels of the template are checked at its usual place
+        before looking for it (screen-defining elements).
+    engine: The matching engine of the template: "gray" (gray levels) or "chamfer"
+        (edges, for glowing or animated elements).
+    """
+
+
+class TemplateRegistry:
+    """
+    The templates of a resolution, with the images of a locale (if any) replacing
+    the default ones:
+
+        files/<resolution>/buttons/play.png
+        files/i18n/<locale>/<resolution>/buttons/play.png
+    """
+
+    def __init__(self, images_dir, resolution, locale, thresholds):
+        """
+        Resolves every template of 'images_dir/resolution'.
+
+        Args:
+            images_dir (str): The images directory (like "files").
+            resolution (str): The resolution of the templates (like "1920x1080").
+            locale (str): The locale of the game (like "zh"), or "" for none.
+            thresholds (dict): The content of thresholds.json.
+        """
+        self.resolution = resolution
+        self.locale = locale
+        self._templates = {}
+
+        paths = self._scan(f"{images_dir}/{resolution}")
+        if locale:
+            paths.update(self._scan(f"{images_dir}/i18n/{locale}/{resolution}"))
+
+        default = thresholds["default_grey"]
+        no_pyramid = set(thresholds.get("no_pyramid", []))
+        signature = set(thresholds.get("signature", []))
+        # {template: threshold} of the chamfer matching (on another scale)
+        chamfer = thresholds.get("chamfer", {})
+        for name, path in paths.items():
+            # threshold of the template, then of its directory (like "levels")
+            threshold = thresholds.get(name, "-")
+            if threshold == "-":
+                threshold = thresholds.get(name.split("/")[0], "-")
+            if threshold == "-" or not isinstance(threshold, (int, float)):
+                threshold = default
+            if name in chamfer:
+                threshold = chamfer[name]
+            self._templates[name] = Template(
+                name,
+                path,
+                threshold,
+                name in no_pyramid,
+                name in signature,
+                "chamfer" if name in chamfer else "gray",
+            )
+        log.debug(
+            "Template registry: %s templates (%s, locale: %s)",
+            len(self._templates),
+            resolution,
+            locale or "-",
+        )
+
+    @staticmethod
+    def _scan(directory):
+        """
+        Lists the PNG files of a directory.
+
+        Returns:
+            dict: {template name: path} (like {"buttons/play.png": "files/1920x1080/buttons/play.png"}).
+        """
+        paths = {}
+        if not os.path.isdir(directory):
+            return paths
+        for dirpath, _, filenames in os.walk(directory):
+            subdir = os.path.relpath(dirpath, directory).replace(os.sep, "/")
+            for filename in filenames:
+                if filename.endswith(".png"):
+                    name = filename if subdir == "." else f"{subdir}/{filename}"
+                    paths[name] = f"{dirpath}/{filename}".replace(os.sep, "/")
+        return paths
+
+    def __contains__(self, name):
+        return name in self._templates
+
+    def __len__(self):
+        return len(self._templates)
+
+    def get(self, name):
+        """
+        Gets a template.
+
+        Args:
+            name (str): The template name (like "buttons/play.png").
+
+        Returns:
+            Template or None: The template or None if there is no such file.
+        """
+        return self._templates.get(name)
+
+    def require(self, names):
+        """
+        Checks that templates exist.
+
+        Args:
+            names (iterable): The template names.
+
+        Raises:
+            MissingTemplate: If some templates don't exist.
+        """
+        missing = sorted(name for name in names if name not in self._templates)
+        if missing:
+            raise MissingTemplate(
+                f"Missing images for {self.resolution}: {', '.join(missing)}"
+            )
@@ -0,0 +1,172 @@
+"""
+This module provides the model of the screen transitions observed by the bot.
+
+The screens follow each other in a predictable way during a bounty (view_party, play,
+then the battle, the treasures, view_party again...). Each screen recognized is counted
+as a transition from the previous one (a Markov table), and the time spent to look for
+each template is measured, so the screens can be probed from the most likely (and
+cheapest) one.
+
+Classes:
+- TransitionModel: Persisted table of the screen transitions and of the probe costs.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from modules.file_utils import readjson, writejson
+
+log = logging.getLogger(__name__)
+
+SAVE_INTERVAL = 60
+# count added to every transition (never observed transitions keep a small probability)
+PRIOR_COUNT = 0.5
+# count added to the transitions declared in the screen catalog ("next" screens)
+EXPECTED_COUNT = 2
+# cost (in seconds) of a template never looked for
+DEFAULT_COST = 0.02
+# weight of the last measure in the moving average of the costs
+COST_SMOOTHING = 0.2
+
+
+class TransitionModel:
+    """
+    Transitions between screens and costs of the probes, saved in a JSON file:
+
+        {"transitions": {"view_party": {"play": 12, "campfire": 1}},
+         "costs": {"buttons/play.png": 0.004}}
+    """
+
+    def __init__(self, filename):
+        """
+        Loads the model from 'filename' (if it exists) and saves it at exit.
+
+        Args:
+            filename (str): The JSON file of the model.
+        """
+        self.filename = filename
+        self.previous = None
+        self._transitions = {}
+        self._costs = {}
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        if os.path.isfile(filename):
+            try:
+                data = readjson(filename)
+                self._transitions = data.get("transitions", {})
+                self._costs = data.get("costs", {})
+            except (ValueError, AttributeError) as error:
+                log.warning("Ignoring corrupted transitions %s: %s", filename, error)
+        atexit.register(self.save)
+
+    def probability(self, name, previous=None, expected=()):
+        """
+        Gets the probability of a screen after another one.
+
+        Args:
+            name (str): The screen (like "play").
+            previous (str): The previous screen. Defaults to None (the last observed screen).
+            expected (list): The screens declared after the previous one (see
+                ScreenCatalog.successors). Defaults to none.
+
+        Returns:
+            float: The probability (with PRIOR_COUNT added to every transition,
+            and EXPECTED_COUNT to the expected ones).
+        """
+        previous = self.previous if previous is None else previous
+        counts = dict(self._transitions.get(previous, {}))
+        for screen in expected:
+            counts[screen] = counts.get(screen, 0) + EXPECTED_COUNT
+        total = sum(counts.values()) + PRIOR_COUNT * (len(counts) + 1)
+        return (counts.get(name, 0) + PRIOR_COUNT) / total
+
+    def cost(self, file):
+        """
+        Gets the mean time spent to look for a template.
+
+        Args:
+            file (str): The template file (like "buttons/play.png").
+
+        Returns:
+            float: The cost in seconds (DEFAULT_COST if it was never measured).
+        """
+        return self._costs.get(file, DEFAULT_COST)
+
+    def order(self, screens, previous=None, expected=()):
+        """
+        Sorts screens by priority, then by probability (after the previous screen)
+        divided by cost, the order of 'screens' breaking the ties: a likely screen
+        is never probed before a screen of a higher priority that can be shown over it.
+
+        Args:
+            screens (list): The screens, with a 'name', a 'file' and a 'priority' attribute.
+            previous (str): The previous screen. Defaults to None (the last observed screen).
+            expected (list): The screens declared after the previous one. Defaults to none.
+
+        Returns:
+            list: The screens, the most worth probing first.
+        """
+        return sorted(
+            screens,
+            key=lambda screen: (
+                screen.priority,
+                -self.probability(screen.name, previous, expected)
+                / max(self.cost(screen.file), 1e-4),
+            ),
+        )
+
+    def observe(self, name):
+        """
+        Counts the transition from the previous screen to 'name'.
+
+        Args:
+            name (str): The screen recognized (like "play").
+        """
+        with self._lock:
+            if self.previous is not None:
+                counts = self._transitions.setdefault(self.previous, {})
+                counts[name] = counts.get(name, 0) + 1
+                self._dirty = True
+            self.previous = name
+        self._save_if_needed()
+
+    def measure(self, file, duration):
+        """
+        Adds the time spent to look for a template to its moving average.
+
+        Args:
+            file (str): The template file (like "buttons/play.png").
+            duration (float): The time spent (in seconds).
+        """
+        with self._lock:
+            cost = self._costs.get(file)
+            if cost is None:
+                self._costs[file] = duration
+            else:
+                self._costs[file] = cost + COST_SMOOTHING * (duration - cost)
+            self._dirty = True
+
+    def _save_if_needed(self):
+        if time.monotonic() - self._last_save > SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """
+        Saves the model if it was modified.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                writejson(
+                    self.filename,
+                    {"transitions": self._transitions, "costs": self._costs},
+                )
+                self._dirty = False
+            except OSError as error:
+                log.warning("Couldn't save transitions %s: %s", self.filename, error)
+            self._last_save = time.monotonic()
@@ -2,7 +2,6 @@ import logging
 import os
 from datetime import datetime
 
-from modules.game import wait_until_timeout
 from modules.utils import rsleep
 
 """
@@ -22,7 +21,12 @@ from queue import PriorityQueue
 import cv2
 
 from modules.constants import Action, Button, UIElement
-from modules.image_utils import find_element
+from modules.image_utils import (
+    find_element,
+    find_elements,
+    invalidate_frame,
+    wait_for,
+)
 from modules.mouse_utils import move_mouse_and_click
 from modules.platforms import windowMP
 from modules.settings import settings_dict, treasures_priority
@@ -36,6 +40,8 @@ from .settings import settings_dict, treasures_priority
 log = logging.getLogger(__name__)
 
 TREASURES_DIR = "treasures"
+# seconds waited for the take button before waiting again
+TAKE_TIMEOUT = 3
 
 
 def chooseTreasure():
@@ -65,12 +71,17 @@ def chooseTreasure():
         fn = f"{treasure_log_dir}/{time_stamp}.png"
         save_screenshot(fn)
 
+    treasures = []
     while not treasures_queue.empty():
         next_treasure = treasures_queue.get()[1]
+        treasures.append(str(f"{TREASURES_DIR}/{next_treasure}.png"))
 
-        treasure = str(f"{TREASURES_DIR}/{next_treasure}.png")
-
-        if find_element(treasure, Action.move_and_click, threshold=0.88):
+    # look for every known treasure on the same screenshot
+    # and pick the one with the best priority
+    for result in find_elements(treasures, threshold=0.88):
+        if result.found:
+            x, y = result.random_coords()
+            move_mouse_and_click(windowMP(), x, y)
             rsleep(1)
             break
     else:
@@ -89,13 +100,11 @@ def chooseTreasure():
             move_mouse_and_click(windowMP(), x, y)
             rsleep(1)
 
-    while not (
-        find_element(Button.take.filename, Action.move_and_click)
-        or find_element(Button.keep.filename, Action.move_and_click)
-        or find_element(Button.replace.filename, Action.move_and_click)
-    ):
-        wait_until_timeout(Button.take, 1, 0.5)
-        wait_until_timeout(Button.keep, 1, 0.5)
-        wait_until_timeout(Button.replace, 1, 0.5)
-        rsleep(1)
+    # take, keep and replace are the same button (looked for once per frame)
+    result = None
+    while result is None:
+        result = wait_for([Button.take, Button.keep, Button.replace], TAKE_TIMEOUT)
+    x, y = result.random_coords()
+    move_mouse_and_click(windowMP(), x, y)
+    invalidate_frame()
 